@@ -0,0 +1,71 @@
+"""
+Accuracy versus speed of the approximate 'grid' force kernel against the exact kernel.
+
+For growing numbers of vertices, the forces of a random layout are calculated with
+both kernels. Reported are the time per force evaluation and the relative error
+(norm of the difference divided by the norm of the exact forces), for different
+leaf sizes of the grid, with and without the second order (quadrupole) terms.
+
+Usage: python benchmarks/bench_grid_forces.py
+
+"""
+
+import timeit
+import numpy as np
+from incapy.condensed import condensed_size, condensed_pairs
+from incapy.grid_forces import GridForces
+
+
+def exact_displacement(positions, weights, natural_spring_length, repulsive_const):
+    """
+    Exact forces over all pairs of vertices, same as the condensed kernel of GraphAlgorithm.
+
+    """
+
+    num_vert = len(positions)
+    sources, targets = condensed_pairs(num_vert)
+    diff = positions[sources] - positions[targets]
+    diff_length = np.sqrt(np.sum(diff**2, axis=-1))
+    diff_length[diff_length == 0] = 1
+    diff /= diff_length[:, np.newaxis]
+    force = repulsive_const*(natural_spring_length**2)/diff_length*weights
+    force -= diff_length ** 2 / natural_spring_length
+    diff *= force[:, np.newaxis]
+    displacement = np.empty((num_vert, 2))
+    for axis in range(2):
+        displacement[:, axis] = (np.bincount(sources, diff[:, axis], minlength=num_vert)
+                                 - np.bincount(targets, diff[:, axis], minlength=num_vert))
+    return displacement
+
+
+def main():
+    rng = np.random.default_rng(0)
+    natural_spring_length = 1
+    repulsive_const = 1
+
+    row = "{:>8} {:>10} {:>11} {:>12} {:>12} {:>8} {:>10}"
+    print(row.format("vertices", "leaf size", "quadrupole", "exact [s]", "grid [s]", "speedup", "rel. error"))
+    for num_vert in (100, 300, 1000, 3000, 5000):
+        # Electrodes on a square grid, slightly moved, and mostly weak correlations
+        side = int(np.ceil(np.sqrt(num_vert)))
+        positions = np.stack(np.divmod(np.arange(num_vert), side), axis=-1).astype(float)
+        positions += rng.normal(scale=0.3, size=positions.shape)
+        weights = 1 - np.abs(rng.normal(scale=0.1, size=condensed_size(num_vert)))
+
+        repeat = 3
+        exact = exact_displacement(positions, weights, natural_spring_length, repulsive_const)
+        t_exact = min(timeit.repeat(lambda: exact_displacement(positions, weights, natural_spring_length,
+                                                               repulsive_const), number=1, repeat=repeat))
+
+        for leaf_size, quadrupole in ((16, False), (8, True), (16, True), (32, True)):
+            grid = GridForces(leaf_size, quadrupole)
+            approx = grid.displacement(positions, weights, natural_spring_length, repulsive_const)
+            t_grid = min(timeit.repeat(lambda: grid.displacement(positions, weights, natural_spring_length,
+                                                                 repulsive_const), number=1, repeat=repeat))
+            error = np.linalg.norm(approx - exact) / np.linalg.norm(exact)
+            print(row.format(num_vert, leaf_size, str(quadrupole), "{:.4f}".format(t_exact), "{:.4f}".format(t_grid),
+                             "{:.1f}".format(t_exact/t_grid), "{:.2e}".format(error)))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,50 @@
+"""
+Benchmark of the time to import the parts of incapy, as needed by a new (e.g. worker) process.
+
+Every import is timed in a fresh interpreter, reported is the median of several runs. The view
+stack (holoviews, bokeh, ipywidgets) is only imported when a JupyterView is created, which is
+timed separately by importing it directly.
+
+Usage: python benchmarks/bench_import_time.py [runs]
+
+"""
+
+import os
+import statistics
+import subprocess
+import sys
+
+# Statement to be timed, with a description
+IMPORTS = (
+    ("loader", "from incapy.load_data import DataLoader"),
+    ("controller", "from incapy.graph_controller import GraphAlgorithm"),
+    ("incapy", "from incapy.incapy import Incapy"),
+    ("view stack", "from incapy.jupyter_view import _import_view_stack; _import_view_stack()"),
+)
+
+TIMER = "import time; start = time.perf_counter(); {}; print(time.perf_counter() - start)"
+
+
+def measure(statement, runs):
+    # The package is imported from the repository, also if it is not installed
+    root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+    env = dict(os.environ, PYTHONPATH=os.pathsep.join(filter(None, (root, os.environ.get('PYTHONPATH')))))
+
+    times = []
+    for _ in range(runs):
+        output = subprocess.run([sys.executable, "-c", TIMER.format(statement)], env=env, check=True,
+                                capture_output=True, text=True).stdout
+        times.append(float(output))
+    return statistics.median(times)
+
+
+def main():
+    runs = int(sys.argv[1]) if len(sys.argv) > 1 else 5
+    row = "{:>12} {:>12}  {}"
+    print(row.format("import", "time [ms]", "statement"))
+    for name, statement in IMPORTS:
+        print(row.format(name, "{:.1f}".format(measure(statement, runs) * 1000), statement))
+
+
+if __name__ == '__main__':
+    main()
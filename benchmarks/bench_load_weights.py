@@ -0,0 +1,56 @@
+"""
+Benchmark of the weight construction in DataLoader.
+
+Compares the batched construction of all weight matrices against the former
+loop over the windows, for growing numbers of windows and vertices.
+
+Usage: python benchmarks/bench_load_weights.py
+
+"""
+
+import timeit
+import numpy as np
+from incapy.load_data import DataLoader
+
+
+def loop_weights(loader, x_corr, num_vert):
+    """
+    The former construction, one window at a time.
+
+    """
+
+    weights = np.zeros((x_corr.shape[0], num_vert, num_vert), dtype='float64')
+    upper = np.triu_indices(num_vert)
+    for timestamp in range(x_corr.shape[0]):
+        weights[timestamp][upper] = x_corr[timestamp]
+        weights[timestamp] += weights[timestamp].T
+        weights[timestamp] -= np.diag(np.diag(weights[timestamp]))
+        weights[timestamp], _ = loader.x_corr_to_weight(weights[timestamp])
+    return weights
+
+
+def main():
+    loader = DataLoader()
+    rng = np.random.default_rng(0)
+
+    print("{:>8} {:>8} {:>12} {:>12} {:>8}".format("windows", "vertices", "loop [s]", "batched [s]", "speedup"))
+    for num_vert in (100, 200, 400):
+        for num_windows in (10, 100, 1000):
+            # Keep the benchmark within a few GB of memory
+            if num_windows * num_vert**2 * 8 > 2**30:
+                continue
+            x_corr = rng.random((num_windows, num_vert*(num_vert+1)//2))
+
+            # Both paths need to produce the same weights
+            assert np.array_equal(loop_weights(loader, x_corr, num_vert),
+                                  loader.calculate_weights(x_corr, num_vert))
+
+            repeat = 3
+            t_loop = min(timeit.repeat(lambda: loop_weights(loader, x_corr, num_vert), number=1, repeat=repeat))
+            t_batched = min(timeit.repeat(lambda: loader.calculate_weights(x_corr, num_vert), number=1, repeat=repeat))
+            print("{:>8} {:>8} {:>12.4f} {:>12.4f} {:>8.1f}".format(num_windows, num_vert, t_loop, t_batched,
+                                                                   t_loop/t_batched))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,60 @@
+"""
+Micro-benchmark of a single layout step with the 'exact' and the 'buffered' force kernel.
+
+Reports the latency per step and the peak memory allocated during a step (traced by
+tracemalloc, which numpy reports its array allocations to), for full and condensed weights.
+
+Usage: python benchmarks/bench_step_buffers.py
+
+"""
+
+import os
+import tempfile
+import time
+import tracemalloc
+from incapy.graph_controller import GraphAlgorithm
+from incapy.graph_model import GraphModel
+from incapy.load_data import DataLoader
+from synthetic import write_recording
+
+
+def measure(filename, force_kernel, condensed_weights, steps):
+    model = GraphModel()
+    controller = GraphAlgorithm(model, filename, DataLoader, 1, 1, 30, condensed_weights=condensed_weights,
+                                force_kernel=force_kernel)
+    controller.init_algorithm()
+    # Warm up, e.g. for allocating buffers on first use
+    controller.do_step()
+
+    start = time.perf_counter()
+    for _ in range(steps):
+        controller.do_step()
+    latency = (time.perf_counter() - start) / steps
+
+    tracemalloc.start()
+    before, _ = tracemalloc.get_traced_memory()
+    tracemalloc.reset_peak()
+    controller.do_step()
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+
+    return latency, peak - before
+
+
+def main():
+    row = "{:>8} {:>10} {:>10} {:>14} {:>18}"
+    print(row.format("vertices", "weights", "kernel", "latency [ms]", "allocated [bytes]"))
+    with tempfile.TemporaryDirectory() as directory:
+        for num_vert in (100, 300, 1000):
+            filename = os.path.join(directory, "recording_{}.h5".format(num_vert))
+            write_recording(filename, num_vert, 2)
+            steps = max(3, 20000 // num_vert)
+            for condensed_weights in (False, True):
+                for force_kernel in ('exact', 'buffered'):
+                    latency, allocated = measure(filename, force_kernel, condensed_weights, steps)
+                    print(row.format(num_vert, "condensed" if condensed_weights else "dense", force_kernel,
+                                     "{:.3f}".format(latency * 1000), allocated))
+
+
+if __name__ == '__main__':
+    main()
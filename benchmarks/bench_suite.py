@@ -0,0 +1,260 @@
+"""
+Benchmark suite over synthetic recordings of configurable size (see synthetic.py).
+
+For every combination of number of vertices and windows, a recording is written and timed:
+loading the data, creating the controller, switching windows (random jumps, and sequential
+switches with the next window prefetched), layout steps per force kernel, threshold masking
+and view updates. The results are printed and written as JSON report, to be compared across
+releases.
+
+Usage: python benchmarks/bench_suite.py [--vertices 100 1000 5000] [--windows 10 1000 100000]
+                                        [--kernels exact buffered grid] [--output report.json]
+
+"""
+
+import argparse
+import datetime
+import json
+import os
+import platform
+import subprocess
+import tempfile
+import time
+import numpy as np
+from incapy.graph_controller import GraphAlgorithm
+from incapy.graph_model import GraphModel
+from incapy.load_data import DataLoader, LazyDataLoader
+from synthetic import write_recording
+
+
+LOADERS = {'lazy': LazyDataLoader, 'eager': DataLoader}
+
+
+def summarize(times):
+    """
+    Returns statistics of measured durations.
+
+    :param times: list
+        The durations (in seconds)
+    :return: dict
+        Number of measurements, mean, median, minimum and maximum (in seconds)
+
+    """
+
+    times = np.asarray(times, dtype=float)
+    if len(times) == 0:
+        return None
+    return {'count': len(times), 'mean': float(times.mean()), 'median': float(np.median(times)),
+            'min': float(times.min()), 'max': float(times.max())}
+
+
+def timed(function, *args):
+    start = time.perf_counter()
+    function(*args)
+    return time.perf_counter() - start
+
+
+def make_controller(filename, loader, dtype, force_kernel='exact'):
+    model = GraphModel()
+    controller = GraphAlgorithm(model, filename, LOADERS[loader], 1, 1, 30, dtype=dtype, force_kernel=force_kernel,
+                                shared_data=False)
+    return model, controller
+
+
+def bench_loading(filename, loader, dtype):
+    data_loader = LOADERS[loader](dtype=dtype)
+    load = timed(data_loader.load_data, filename)
+    if hasattr(data_loader, 'close'):
+        data_loader.close()
+
+    start = time.perf_counter()
+    model, controller = make_controller(filename, loader, dtype)
+    controller_init = time.perf_counter() - start
+    return {'load': load, 'controller_init': controller_init}, model, controller
+
+
+def bench_window_switch(controller, switches, rng):
+    num_windows = controller.loader.number_windows
+
+    # Jumps to random windows, usually not prefetched; never to the current window, that would return at once
+    random_times = []
+    for _ in range(switches if num_windows > 1 else 0):
+        window = (controller.current_window + 1 + int(rng.integers(num_windows - 1))) % num_windows
+        random_times.append(timed(controller.next_window, window))
+
+    # Moves on to the next window after its data has been prefetched
+    sequential_times = []
+    controller.next_window(0)
+    for _ in range(min(switches, num_windows - 1)):
+        if controller.prefetcher.future is not None:
+            controller.prefetcher.future.result()
+        sequential_times.append(timed(controller.next_window))
+    return {'window_switch_random': summarize(random_times), 'window_switch_sequential': summarize(sequential_times)}
+
+
+def bench_steps(filename, loader, dtype, kernels, steps):
+    results = {}
+    for kernel in kernels:
+        model, controller = make_controller(filename, loader, dtype, kernel)
+        controller.init_algorithm()
+        # The first step allocates the buffers of the 'buffered' kernel
+        controller.do_step()
+        results['step_' + kernel] = summarize([timed(controller.do_step) for _ in range(steps)])
+        controller.close()
+    return results
+
+
+def bench_threshold(controller, thresholds, rng):
+    return {'threshold': summarize([timed(controller.set_edge_threshold, float(threshold))
+                                    for threshold in rng.uniform(0.2, 0.9, size=thresholds)])}
+
+
+class DiscardView:
+    """
+    Receives the updates of the model without showing them.
+
+    """
+
+    def update(self, data):
+        pass
+
+
+def bench_view_update(model, updates):
+    """
+    Times updating the views: the model side alone (without a real view) and, if the
+    visualization stack is available, the update of a JupyterView.
+
+    """
+
+    results = {}
+    view = DiscardView()
+    model.add_listener(view)
+    results['model_update'] = summarize([timed(model._update_view) for _ in range(updates)])
+    model.listeners.remove(view)
+
+    try:
+        from incapy.jupyter_view import JupyterView
+        view = JupyterView(model, update_weight_time=30, anim_speed_const=1)
+    except Exception as error:
+        results['view_update'] = None
+        results['view_update_error'] = "{}: {}".format(type(error).__name__, error)
+        return results
+
+    model.profiler.set_enabled(True)
+    results['view_update'] = summarize([timed(model._update_view) for _ in range(updates)])
+    # Split up into the stages of the view (see JupyterView.update)
+    stages = model.profiler.stats()['stages']
+    for stage in ('build_nodes', 'pipe_send'):
+        if stage in stages:
+            results['view_' + stage] = {key: stages[stage][key] for key in ('count', 'mean', 'p50', 'p99', 'max')}
+    model.profiler.set_enabled(False)
+    model.listeners.remove(view)
+    return results
+
+
+def run(num_vert, num_windows, args, directory):
+    """
+    Writes a recording and runs all benchmarks on it.
+
+    :return: dict
+        The results of the recording
+
+    """
+
+    num_edges = num_vert * (num_vert + 1) // 2
+    size = num_edges * (num_windows + 1) * np.dtype(args.dtype).itemsize
+    result = {'vertices': num_vert, 'windows': num_windows, 'edges': num_edges, 'file_size': size}
+    if size > args.max_size * 2**30:
+        result['skipped'] = "recording larger than {} GB".format(args.max_size)
+        return result
+
+    filename = os.path.join(directory, "recording_{}_{}.h5".format(num_vert, num_windows))
+    if not os.path.exists(filename):
+        result['write'] = timed(write_recording, filename, num_vert, num_windows, args.seed, args.dtype, args.chunked)
+
+    rng = np.random.default_rng(args.seed)
+    timings, model, controller = bench_loading(filename, args.loader, args.dtype)
+    result.update(timings)
+    result.update(bench_window_switch(controller, args.switches, rng))
+    result.update(bench_threshold(controller, args.thresholds, rng))
+    result.update(bench_view_update(model, args.updates))
+    controller.close()
+    result.update(bench_steps(filename, args.loader, args.dtype, args.kernels, args.steps))
+    return result
+
+
+def environment():
+    """
+    Returns the environment of the benchmark, to tell reports apart.
+
+    :return: dict
+
+    """
+
+    try:
+        commit = subprocess.run(['git', 'rev-parse', 'HEAD'], capture_output=True, text=True,
+                                cwd=os.path.dirname(os.path.abspath(__file__))).stdout.strip() or None
+    except OSError:
+        commit = None
+    return {'date': datetime.datetime.now().isoformat(timespec='seconds'), 'commit': commit,
+            'python': platform.python_version(), 'numpy': np.__version__, 'platform': platform.platform(),
+            'processor': platform.processor(), 'cpus': os.cpu_count()}
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmarks incapy on synthetic recordings.")
+    parser.add_argument('--vertices', type=int, nargs='+', default=[100, 300],
+                        help="numbers of vertices (e.g. 100 1000 5000)")
+    parser.add_argument('--windows', type=int, nargs='+', default=[10, 100],
+                        help="numbers of windows (e.g. 10 1000 100000)")
+    parser.add_argument('--kernels', nargs='+', default=['exact', 'buffered', 'grid'],
+                        choices=('exact', 'buffered', 'grid'), help="force kernels of the layout steps")
+    parser.add_argument('--loader', default='lazy', choices=sorted(LOADERS),
+                        help="lazy reads single windows, eager loads the whole recording (default: lazy)")
+    parser.add_argument('--dtype', default='float64', help="floating point type of the data and the layout")
+    parser.add_argument('--chunked', action='store_true', help="write the recordings with one chunk per window")
+    parser.add_argument('--steps', type=int, default=10, help="layout steps per kernel")
+    parser.add_argument('--switches', type=int, default=20, help="window switches")
+    parser.add_argument('--thresholds', type=int, default=20, help="threshold changes")
+    parser.add_argument('--updates', type=int, default=20, help="view updates")
+    parser.add_argument('--max-size', type=float, default=0.5, help="largest recording written (in GB)")
+    parser.add_argument('--directory', help="directory for the recordings (kept and reused), temporary by default")
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--output', default='report.json', help="filename of the JSON report")
+    args = parser.parse_args()
+
+    report = {'environment': environment(), 'config': vars(args), 'results': []}
+
+    row = "{:>8} {:>8} {:>10} {:>10} {:>12} {:>12} {:>10} {:>10}  {}"
+    print(row.format("vertices", "windows", "load [s]", "init [s]", "jump [ms]", "next [ms]", "thr. [ms]",
+                     "view [ms]", "step [ms]"))
+
+    def milliseconds(stats):
+        return "-" if stats is None else "{:.2f}".format(stats['median'] * 1000)
+
+    with tempfile.TemporaryDirectory() as temporary:
+        directory = args.directory or temporary
+        os.makedirs(directory, exist_ok=True)
+        for num_vert in args.vertices:
+            for num_windows in args.windows:
+                result = run(num_vert, num_windows, args, directory)
+                report['results'].append(result)
+                if 'skipped' in result:
+                    print(row.format(num_vert, num_windows, "-", "-", "-", "-", "-", "-", result['skipped']))
+                    continue
+                steps = " ".join("{}={}".format(kernel, milliseconds(result['step_' + kernel]))
+                                 for kernel in args.kernels)
+                print(row.format(num_vert, num_windows, "{:.2f}".format(result['load']),
+                                 "{:.2f}".format(result['controller_init']),
+                                 milliseconds(result['window_switch_random']),
+                                 milliseconds(result['window_switch_sequential']),
+                                 milliseconds(result['threshold']),
+                                 milliseconds(result['view_update'] or result['model_update']), steps))
+
+    with open(args.output, 'w') as file:
+        json.dump(report, file, indent=2)
+    print("Report written to", args.output)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,57 @@
+"""
+Benchmark of reading single windows from the original and from the converted file layout
+(see incapy.convert).
+
+Reports the file size and the time to read a random window through LazyDataLoader,
+for the original layout and the converted layout with and without compression.
+
+Usage: python benchmarks/bench_window_reads.py
+
+"""
+
+import os
+import tempfile
+import time
+import numpy as np
+from incapy.convert import convert
+from incapy.load_data import LazyDataLoader
+from synthetic import write_recording
+
+
+def measure(filename, reads, seed=0):
+    rng = np.random.default_rng(seed)
+    loader = LazyDataLoader(cache_size=1)
+    loader.load_data(filename)
+    windows = rng.integers(loader.number_windows, size=reads)
+
+    start = time.perf_counter()
+    for window in windows:
+        np.asarray(loader.x_corr[window + 1])
+        # Make sure the next read is not served from the cache
+        loader.x_corr.cache.clear()
+    latency = (time.perf_counter() - start) / reads
+    loader.close()
+    return latency
+
+
+def main():
+    row = "{:>8} {:>8} {:>14} {:>12} {:>16}"
+    print(row.format("vertices", "windows", "layout", "size [MB]", "read [ms/window]"))
+    with tempfile.TemporaryDirectory() as directory:
+        for num_vert, num_windows in ((300, 100), (1000, 50)):
+            original = os.path.join(directory, "recording_{}.h5".format(num_vert))
+            write_recording(original, num_vert, num_windows)
+            files = [("original", original)]
+            for compression in ('lzf', None):
+                converted = os.path.join(directory, "recording_{}_{}.h5".format(num_vert, compression))
+                convert(original, converted, compression=compression)
+                files.append(("chunked " + (compression or "raw"), converted))
+
+            for layout, filename in files:
+                latency = measure(filename, 20)
+                print(row.format(num_vert, num_windows, layout, "{:.1f}".format(os.path.getsize(filename) / 2**20),
+                                 "{:.2f}".format(latency * 1000)))
+
+
+if __name__ == '__main__':
+    main()
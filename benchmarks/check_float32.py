@@ -0,0 +1,103 @@
+"""
+Regression check of the float32 layout against the float64 layout.
+
+The layout never comes to a complete rest (vertices keep moving by up to max_step_size),
+so single positions are chaotic: already a different order of summation in float64 ends
+in different positions after a few hundred steps. Therefore two things are compared:
+
+- the forces of a single step from the same positions, which need to agree to float32 precision
+- the final layout of every window by the distribution of all pairwise distances (its shape
+  and size), which needs to agree within a tolerance relative to the mean distance
+
+Also reports the time per step of both types. Exits with status 1 if a check fails.
+
+Usage: python benchmarks/check_float32.py [filename]
+
+"""
+
+import sys
+import time
+import numpy as np
+from incapy.graph_controller import GraphAlgorithm
+from incapy.graph_model import GraphModel
+from incapy.load_data import DataLoader
+
+# Relative tolerances for the forces and for the distribution of pairwise distances
+FORCE_TOLERANCE = 1e-4
+DISTANCE_TOLERANCE = 0.03
+
+STEPS_PER_WINDOW = 300
+WINDOWS = 3
+
+
+def create_controller(filename, dtype, force_kernel):
+    model = GraphModel()
+    controller = GraphAlgorithm(model, filename, DataLoader, 1, 1, 30, force_kernel=force_kernel, dtype=dtype)
+    controller.init_algorithm()
+    return controller
+
+
+def pairwise_distances(positions):
+    diff = positions[:, np.newaxis, :] - positions[np.newaxis, :, :]
+    upper = np.triu_indices(len(positions), 1)
+    return np.sqrt(np.sum(diff**2, axis=-1))[upper]
+
+
+def final_layouts(controller):
+    """
+    Runs the layout for a number of windows and returns the positions at the end of each window,
+    and the time per step.
+
+    """
+
+    layouts = []
+    start = time.perf_counter()
+    for window in range(WINDOWS):
+        controller.next_window(window)
+        for _ in range(STEPS_PER_WINDOW):
+            controller.do_step()
+        layouts.append(np.array(controller.model.vertex_pos, dtype='float64'))
+    return layouts, (time.perf_counter() - start) / (WINDOWS * STEPS_PER_WINDOW)
+
+
+def main():
+    filename = sys.argv[1] if len(sys.argv) > 1 else 'examples/example_data/cpp_data.h5'
+    failed = False
+
+    for force_kernel in ('exact', 'buffered', 'grid'):
+        double = create_controller(filename, 'float64', force_kernel)
+        single = create_controller(filename, 'float32', force_kernel)
+
+        # Forces from identical positions, by a step without cap and without centering
+        for controller in (double, single):
+            controller.max_step_size = np.inf
+            controller.graph_center = np.mean(controller.model.vertex_pos, axis=0)
+            controller.anim_speed_const = 0
+        start = np.array(double.model.vertex_pos)
+        double.do_step()
+        single.do_step()
+        force_error = (np.linalg.norm(single.model.vertex_pos - double.model.vertex_pos)
+                       / np.linalg.norm(double.model.vertex_pos - start))
+
+        double = create_controller(filename, 'float64', force_kernel)
+        single = create_controller(filename, 'float32', force_kernel)
+        double_layouts, double_time = final_layouts(double)
+        single_layouts, single_time = final_layouts(single)
+
+        distance_errors = []
+        for double_layout, single_layout in zip(double_layouts, single_layouts):
+            double_distances = np.sort(pairwise_distances(double_layout))
+            single_distances = np.sort(pairwise_distances(single_layout))
+            distance_errors.append(np.mean(np.abs(single_distances - double_distances)) / np.mean(double_distances))
+
+        ok = force_error < FORCE_TOLERANCE and max(distance_errors) < DISTANCE_TOLERANCE
+        failed |= not ok
+        print("{:>8}: force error {:.1e}, distance error {:.1e}, step {:.2f} ms (float64) {:.2f} ms (float32) {}"
+              .format(force_kernel, force_error, max(distance_errors), double_time * 1000, single_time * 1000,
+                      "ok" if ok else "FAILED"))
+
+    sys.exit(1 if failed else 0)
+
+
+if __name__ == '__main__':
+    main()
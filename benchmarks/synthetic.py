@@ -0,0 +1,93 @@
+"""
+Synthetic recordings in the hdf5 format read by DataLoader.
+
+The electrodes are placed on a square grid. Their correlations are mostly close to zero,
+with a few groups of strongly correlated electrodes that change from window to window.
+
+"""
+
+import numpy as np
+import h5py as h5
+
+
+def write_recording(filename, num_vert, num_windows, seed=0, dtype='float64', chunked=False, max_memory=2**27):
+    """
+    Writes a synthetic recording. Windows are generated and written in blocks, so recordings
+    of any size can be written with bounded memory.
+
+    :param filename: string
+        The filename of the hdf5 file to be written
+    :param num_vert: int
+        The number of vertices (electrodes)
+    :param num_windows: int
+        The number of windows
+    :param seed: int
+        Seed of the random number generator
+    :param dtype: string or numpy dtype
+        Floating point type of the cross-correlations
+    :param chunked: bool
+        If 'True', the cross-correlations are stored with one chunk per window (as by incapy.convert),
+        else contiguously
+    :param max_memory: int
+        Maximum size (in bytes) of the windows generated at once
+
+    :return: None
+
+    """
+
+    rng = np.random.default_rng(seed)
+    sources, targets = np.triu_indices(num_vert)
+    num_edges = len(sources)
+
+    side = int(np.ceil(np.sqrt(num_vert)))
+    ids = np.arange(num_vert)
+
+    with h5.File(filename, 'w') as file:
+        file['eTvGraphVersion'] = 1.0
+        file['isDirected'] = 0
+        file['vertexIDs'] = ids
+        file['edgeIDs'] = np.stack((sources, targets), axis=-1)
+        file['staticData/edgeAttributes/_adjacency'] = np.stack((sources, targets), axis=-1)
+        # Columns: vertex id, x and y position on the grid
+        file['staticData/vertexAttributes/position'] = np.stack((ids, ids // side, ids % side), axis=-1).astype(float)
+
+        starts = np.arange(num_windows) * 5000
+        file['timeVariantData/frameDuration'] = np.stack((starts, starts + 5000), axis=-1)
+
+        # First column holds the edge indices, then one column per window
+        dtype = np.dtype(dtype)
+        x_corr = file.create_dataset('timeVariantData/edgeAttributes/CrossCorrelations', (num_edges, num_windows + 1),
+                                     dtype=dtype, chunks=(num_edges, 1) if chunked else None)
+        x_corr[:, 0] = np.arange(num_edges)
+        if chunked:
+            file.attrs['numVertices'] = num_vert
+            file.attrs['numWindows'] = num_windows
+
+        block_size = max(1, max_memory // (num_edges * dtype.itemsize))
+        for first in range(0, num_windows, block_size):
+            block = np.empty((num_edges, min(block_size, num_windows - first)), dtype=dtype)
+            for index in range(block.shape[1]):
+                block[:, index] = window_correlations(rng, num_vert, sources, targets)
+            x_corr[:, first + 1:first + 1 + block.shape[1]] = block
+
+
+def window_correlations(rng, num_vert, sources, targets, num_groups=4):
+    """
+    Returns the condensed correlations of one window.
+
+    :return: Numpy 1D array
+        Correlations for all (source, target) pairs
+
+    """
+
+    # Weak background correlations
+    correlations = np.abs(rng.normal(scale=0.05, size=len(sources)))
+
+    # Vertices of the same group are strongly correlated
+    groups = rng.integers(-num_groups, num_groups, size=num_vert)
+    same_group = (groups[sources] == groups[targets]) & (groups[sources] >= 0)
+    correlations[same_group] = rng.uniform(0.5, 0.9, size=np.count_nonzero(same_group))
+
+    # Correlation of an electrode with itself
+    correlations[sources == targets] = 1
+    return correlations
@@ -0,0 +1,96 @@
+import numpy as np
+
+
+# Conversion of CIE L*a*b* colors (reference white D50, 2 degree observer) to sRGB,
+# with the same constants and steps as the colormath package, for all colors at once.
+
+# Reference whites (XYZ) of the illuminants D50 and D65, 2 degree observer
+WHITE_D50 = np.array((0.96422, 1.00000, 0.82521))
+WHITE_D65 = np.array((0.95047, 1.00000, 1.08883))
+
+# Bradford cone response matrix for the chromatic adaptation
+BRADFORD = np.array(((0.8951, 0.2664, -0.1614),
+                     (-0.7502, 1.7135, 0.0367),
+                     (0.0389, -0.0685, 1.0296)))
+
+# Linear sRGB from XYZ (D65)
+XYZ_TO_SRGB = np.array(((3.24071, -1.53726, -0.498571),
+                        (-0.969258, 1.87599, 0.0415557),
+                        (0.0556352, -0.203996, 1.05707)))
+
+# Threshold of the linear part of the L*a*b* function
+CIE_E = 216.0 / 24389.0
+
+
+def lab_to_xyz(lab, white=WHITE_D50):
+    """
+    Converts L*a*b* colors to XYZ.
+
+    :param lab: Numpy 2D array, shape (X, 3)
+        L*, a* and b* of every color
+    :param white: Numpy 1D array
+        The reference white
+    :return: Numpy 2D array, shape (X, 3)
+        X, Y and Z of every color
+
+    """
+
+    lab = np.asarray(lab, dtype=float)
+    y = (lab[:, 0] + 16.0) / 116.0
+    xyz = np.stack((lab[:, 1] / 500.0 + y, y, y - lab[:, 2] / 200.0), axis=-1)
+
+    cubed = xyz**3
+    xyz = np.where(cubed > CIE_E, cubed, (xyz - 16.0 / 116.0) / 7.787)
+    return xyz * white
+
+
+def adaptation_matrix(source_white, target_white):
+    """
+    Returns the Bradford matrix adapting XYZ colors from one reference white to another.
+
+    :param source_white: Numpy 1D array
+        The reference white of the colors
+    :param target_white: Numpy 1D array
+        The reference white to adapt to
+    :return: Numpy 2D array, shape (3, 3)
+        The adaptation matrix
+
+    """
+
+    ratio = np.diag(BRADFORD @ target_white / (BRADFORD @ source_white))
+    return np.linalg.pinv(BRADFORD) @ ratio @ BRADFORD
+
+
+def xyz_to_srgb(xyz):
+    """
+    Converts XYZ colors (reference white D65) to sRGB.
+
+    :param xyz: Numpy 2D array, shape (X, 3)
+        X, Y and Z of every color
+    :return: Numpy 2D array, shape (X, 3)
+        R, G and B of every color, between 0 and 1
+
+    """
+
+    linear = np.maximum(xyz @ XYZ_TO_SRGB.T, 0.0)
+    # Gamma companding of sRGB
+    rgb = np.where(linear <= 0.0031308, linear * 12.92, 1.055 * linear**(1 / 2.4) - 0.055)
+    return np.clip(rgb, 0.0, 1.0)
+
+
+def lab_to_hex(lab):
+    """
+    Converts L*a*b* colors (reference white D50) to sRGB hex colors. Colors outside
+    of the sRGB gamut are clipped.
+
+    :param lab: Numpy 2D array, shape (X, 3)
+        L*, a* and b* of every color
+    :return: list
+        The hex colors in the form '#rrggbb'
+
+    """
+
+    xyz = lab_to_xyz(lab) @ adaptation_matrix(WHITE_D50, WHITE_D65).T
+    rgb = np.floor(0.5 + xyz_to_srgb(xyz) * 255).astype(int)
+    packed = (rgb[:, 0] << 16) | (rgb[:, 1] << 8) | rgb[:, 2]
+    return ['#%06x' % color for color in packed.tolist()]
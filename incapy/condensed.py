@@ -0,0 +1,108 @@
+from functools import lru_cache
+import numpy as np
+
+
+# Condensed weights hold the upper triangle (including the diagonal) of a symmetric
+# matrix as a flat vector, ordered as given by np.triu_indices, i.e. the same order as
+# the edge IDs and cross-correlations in the data files.
+
+def condensed_size(num_vert):
+    """
+    Returns the length of the condensed vector of a matrix with 'num_vert' rows.
+
+    :param num_vert: int
+        The number of vertices
+    :return: int
+        The number of upper triangular entries (including the diagonal)
+
+    """
+
+    return num_vert*(num_vert+1)//2
+
+
+@lru_cache(maxsize=4)
+def condensed_pairs(num_vert):
+    """
+    Returns the (source, target) vertex indices of all condensed entries.
+
+    :param num_vert: int
+        The number of vertices
+    :return: tuple of two Numpy 1D arrays
+        Source and target indices, source <= target
+
+    """
+
+    return np.triu_indices(num_vert)
+
+
+@lru_cache(maxsize=4)
+def condensed_index(num_vert):
+    """
+    Returns the position of every matrix entry in the condensed vector,
+    mirrored for the lower triangle.
+
+    :param num_vert: int
+        The number of vertices
+    :return: Numpy 2D array, shape (num_vert, num_vert)
+        Indices into the condensed vector
+
+    """
+
+    upper = condensed_pairs(num_vert)
+    index = np.empty((num_vert, num_vert), dtype=np.intp)
+    index[upper] = np.arange(len(upper[0]))
+    index[upper[1], upper[0]] = index[upper]
+    return index
+
+
+def condensed_to_square(condensed, num_vert, diagonal_value=None):
+    """
+    Expands condensed upper triangular values into symmetric square matrices.
+
+    :param condensed: Numpy array, shape (..., num_vert*(num_vert+1)/2)
+        The condensed values; any leading dimensions (e.g. windows) are kept
+    :param num_vert: int
+        The number of vertices
+    :param diagonal_value: float
+        If given, the diagonal of the matrices is overwritten with this value
+    :return: Numpy array, shape (..., num_vert, num_vert)
+        The symmetric matrices
+
+    """
+
+    # Gather the values of all matrices at once; windows stay the outer dimension
+    square = np.take(condensed, condensed_index(num_vert), axis=-1)
+
+    if diagonal_value is not None:
+        square.reshape(square.shape[:-2] + (num_vert**2,))[..., ::num_vert + 1] = diagonal_value
+
+    return square
+
+
+def square_to_condensed(square):
+    """
+    Condenses symmetric square matrices into their upper triangular values.
+
+    :param square: Numpy array, shape (..., num_vert, num_vert)
+        The symmetric matrices
+    :return: Numpy array, shape (..., num_vert*(num_vert+1)/2)
+        The condensed values
+
+    """
+
+    upper = condensed_pairs(square.shape[-1])
+    return square[..., upper[0], upper[1]]
+
+
+def diagonal_positions(num_vert):
+    """
+    Returns the positions of the diagonal entries in the condensed vector.
+
+    :param num_vert: int
+        The number of vertices
+    :return: Numpy 1D array
+        Indices into the condensed vector
+
+    """
+
+    return np.diagonal(condensed_index(num_vert)).copy()
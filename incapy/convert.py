@@ -0,0 +1,90 @@
+"""
+Converts data files into a layout for reading single windows.
+
+The cross-correlations are rewritten with one chunk per window (a column of the dataset) and
+compressed, all other data is copied. Reading a window then reads and decompresses a single
+chunk, instead of touching the whole dataset. The number of vertices and windows are stored as
+attributes 'numVertices' and 'numWindows' of the file. The converted files are read by all loaders,
+LazyDataLoader benefits the most.
+
+Usage: python -m incapy.convert input.h5 output.h5 [--compression lzf] [--dtype float32]
+
+"""
+
+import argparse
+import posixpath
+import numpy as np
+import h5py as h5
+
+
+# Path of the cross-correlations in the data files
+CROSS_CORRELATIONS = 'timeVariantData/edgeAttributes/CrossCorrelations'
+
+
+def convert(input_filename, output_filename, compression='lzf', dtype=None, max_memory=2**28):
+    """
+    Converts a data file into the layout with one compressed chunk per window.
+
+    :param input_filename: string
+        The filename of the hdf5 file with the data
+    :param output_filename: string
+        The filename of the converted hdf5 file
+    :param compression: string
+        Compression of the cross-correlations: 'lzf' (fast), 'gzip' (smaller) or None
+    :param dtype: string or numpy dtype
+        Floating point type of the cross-correlations, unchanged by default
+    :param max_memory: int
+        Maximum size (in bytes) of the windows converted at once
+
+    :return: None
+
+    """
+
+    with h5.File(input_filename, 'r') as source, h5.File(output_filename, 'w') as target:
+        # Copy everything else as it is
+        def copy(name, item):
+            if name == CROSS_CORRELATIONS:
+                return
+            if isinstance(item, h5.Group):
+                group = target.require_group(name)
+                group.attrs.update(item.attrs)
+            else:
+                source.copy(item, target.require_group(posixpath.dirname(name) or '/'), posixpath.basename(name))
+
+        target.attrs.update(source.attrs)
+        source.visititems(copy)
+
+        x_corr = source[CROSS_CORRELATIONS]
+        num_edges, num_columns = x_corr.shape
+        dtype = np.dtype(dtype or x_corr.dtype)
+
+        # One chunk per column; the first column holds the edge indices, all others a window each
+        output = target.create_dataset(CROSS_CORRELATIONS, x_corr.shape, dtype=dtype, chunks=(num_edges, 1),
+                                       compression=compression, shuffle=compression is not None)
+        output.attrs.update(x_corr.attrs)
+
+        # Columns are read in groups, every chunk of the output is then written once and completely
+        group_size = max(1, max_memory // (num_edges * dtype.itemsize))
+        for first in range(0, num_columns, group_size):
+            columns = np.asarray(x_corr[:, first:first + group_size], dtype=dtype)
+            for index in range(columns.shape[1]):
+                output[:, first + index] = columns[:, index]
+
+        target.attrs['numVertices'] = len(source['vertexIDs'])
+        target.attrs['numWindows'] = num_columns - 1
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Converts a data file into a layout for reading single windows.")
+    parser.add_argument('input', help="hdf5 file with the data")
+    parser.add_argument('output', help="converted hdf5 file")
+    parser.add_argument('--compression', default='lzf', choices=('lzf', 'gzip', 'none'),
+                        help="compression of the cross-correlations (default: lzf)")
+    parser.add_argument('--dtype', default=None, help="floating point type of the cross-correlations, e.g. float32")
+    args = parser.parse_args()
+
+    convert(args.input, args.output, None if args.compression == 'none' else args.compression, args.dtype)
+
+
+if __name__ == '__main__':
+    main()
@@ -4,8 +4,15 @@ from .icontroller import IController
 import time
 import math
 import numpy as np
-from colormath.color_objects import LabColor, sRGBColor
-from colormath.color_conversions import convert_color
+from .condensed import condensed_pairs
+from .grid_forces import GridForces
+from .layout_cache import LayoutCache, layout_key, weights_hash
+from .load_data import load_shared
+from .prefetch import WindowPrefetcher
+from .sparse import SparseWeights
+from .trajectory import TrajectoryWriter
+from .transition import WeightTransition
+from .colors import lab_to_hex
 
 
 class GraphAlgorithm(IController):
@@ -16,7 +23,11 @@ class GraphAlgorithm(IController):
 
     """
 
-    def __init__(self, model, filename, dataloader, repulsive_const, anim_speed_const, update_weight_time):
+    def __init__(self, model, filename, dataloader, repulsive_const, anim_speed_const, update_weight_time,
+                 condensed_weights=False, force_kernel='exact', dtype='float64', sparse_top_k=None,
+                 sparse_cutoff=None, cooling=None, convergence_tolerance=1e-3, tick_rate=60,
+                 shared_data=True, transition_steps=0, transition_easing='linear', layout_cache_size=0,
+                 layout_cache_dir=None):
         """
         Constructor for the GraphAlgorithm class. Initializes all attributes.
 
@@ -30,11 +41,62 @@ class GraphAlgorithm(IController):
             animation speed constant
         :param dataloader: class
             The dataloader class
+        :param update_weight_time: int
+            Time (in seconds) when to load next window
+        :param condensed_weights: bool
+            If 'True', weights are stored and used as condensed upper triangle instead of full matrices
+        :param force_kernel: string
+            How the forces of the layout are calculated: 'exact' evaluates all pairs of vertices,
+            'buffered' does the same in preallocated work buffers (no allocations per step),
+            'grid' approximates far away vertices per grid cell (see GridForces)
+        :param dtype: string or numpy dtype
+            Floating point type of the weights, the positions and the layout calculations;
+            'float32' is sufficient for displaying and halves memory and bandwidth
+        :param sparse_top_k: int
+            If given, only the weights of the top_k strongest correlations of every vertex are kept,
+            all other pairs of vertices are treated as uncorrelated (see incapy.sparse). A step is O(E)
+            in the kept pairs only with the 'grid' kernel; the 'exact' kernel still evaluates the
+            default weight of all O(X^2) pairs of vertices
+        :param sparse_cutoff: float
+            If given, only the weights of pairs whose absolute correlation is greater than the cutoff are kept
+            (as for sparse_top_k, steps are O(E) only with the 'grid' kernel)
+        :param cooling: float
+            If given, the step size decreases by this factor per second within a window (e.g. 0.5), so the
+            layout converges; once converged, the animation sleeps until the next window or a user event
+        :param convergence_tolerance: float
+            The layout has converged when no vertex moves faster than this fraction of the natural
+            spring length per second (only with cooling)
+        :param tick_rate: float
+            Target number of steps per second of the animation, None to step as fast as possible
+        :param shared_data: bool
+            If 'True', the data is loaded once per process and shared (read-only) with all other
+            controllers of the same file (see load_shared)
+        :param transition_steps: int
+            The number of steps over which the weights of a window are blended into those of the next,
+            0 switches at once (see WeightTransition); sparse weights are always switched at once
+        :param transition_easing: string or function
+            How the weights are blended: 'linear', 'smoothstep', 'cosine' or a function of the progress
+        :param layout_cache_size: int
+            If greater than 0, the layouts of this many windows are kept, and a window that is jumped to
+            (or reset to) starts from its previous layout instead of from the static positions (see LayoutCache)
+        :param layout_cache_dir: string
+            If given, the layouts are also stored in this directory and reused by later sessions
 
         """
 
         super().__init__(model)
 
+        if force_kernel not in ('exact', 'buffered', 'grid'):
+            raise ValueError("Unknown force kernel '{}'".format(force_kernel))
+        if force_kernel == 'buffered' and (sparse_top_k is not None or sparse_cutoff is not None):
+            raise ValueError("Sparse weights are not supported by the 'buffered' kernel")
+        self.force_kernel = force_kernel
+        self.dtype = np.dtype(dtype)
+        # Approximation of the forces, only used by the 'grid' kernel
+        self.grid_forces = GridForces()
+        # Arrays reused by every step of the 'buffered' kernel, allocated in init_algorithm
+        self.work_buffers = None
+
         # Needed for threading
         self.wait_event = threading.Event()
         self.mutex = threading.Lock()
@@ -43,11 +105,43 @@ class GraphAlgorithm(IController):
         # Flag that is set to stop or pause execution
         self.stop = False
 
+        # Cooling of the step size within a window, the temperature scales the step size
+        self.cooling = cooling
+        self.temperature = 1
+        # Convergence monitor: largest and mean step of the vertices in the last step
+        self.convergence_tolerance = convergence_tolerance
+        self.step_max = None
+        self.step_mean = None
+        # Set to wake up the animation sleeping until its next step or on a converged layout
+        self.wake_event = threading.Event()
+        # Steps per second of the animation
+        self.tick_rate = tick_rate
+        # Blends the weights between windows, needs to exist before the first window is set
+        self.transition = WeightTransition(transition_steps, transition_easing)
+        # Layouts of the windows shown before, restored when jumping back to a window
+        self.layout_cache = None
+        if layout_cache_size > 0 or layout_cache_dir is not None:
+            self.layout_cache = LayoutCache(max(layout_cache_size, 1), layout_cache_dir)
+        # Hashes of the weights of the windows, part of the keys of the layout cache
+        self.weight_hashes = {}
+        # The window the current positions are laid out for and the number of steps done for it
+        self.positions_window = None
+        self.window_steps = 0
+
         self.model = model
 
         # Load the data
-        self.loader = dataloader()
-        self.loader.load_data(filename)
+        loader_options = dict(condensed=condensed_weights, dtype=self.dtype, top_k=sparse_top_k, cutoff=sparse_cutoff)
+        if shared_data:
+            self.loader = load_shared(dataloader, filename, **loader_options)
+        else:
+            self.loader = dataloader(**loader_options)
+            self.loader.load_data(filename)
+
+        # Loads the next window in the background while the current one is animated
+        self.prefetcher = WindowPrefetcher(self.load_window)
+        self.model.profiler.add_counter('prefetch_hits', lambda: self.prefetcher.hits)
+        self.model.profiler.add_counter('prefetch_misses', lambda: self.prefetcher.misses)
 
         # Calculate the weights
         # TODO currently not used yet (for other functions to be applied)
@@ -61,15 +155,19 @@ class GraphAlgorithm(IController):
 
         # Default value for threshold that determines which edges should be shown
         self.edge_threshold = 0.6
+        # Edge indices sorted by the cross-correlations of a window, so the edges greater than a
+        # threshold are found by binary search. Only rebuilt when the window changes.
+        self.edge_index_window = None
+        self.sorted_edges = None
+        self.sorted_x_corr = None
 
-        # Sets the weights
-        self.next_window(0)
-
-        self.set_edge_threshold(self.edge_threshold)
+        # Repeat is by default false, meaning that after the last window, no more windows will be loaded
+        self.repeat = False
 
         # Constants needed for the force-directed layout algorithm
         self.natural_spring_length = None
-        # TODO: Calculate center
+        # The edges and the hash of the positions the spring length was calculated from
+        self.spring_length_key = None
         self.graph_center = None
         # TODO: Should be changeable by user (interactively?)
         self.repulsive_const = repulsive_const  # Daniel: 1
@@ -78,13 +176,15 @@ class GraphAlgorithm(IController):
         self.max_step_size = self.anim_speed_const/20   # Daniel: 0.9, is however changed every step
         # Get default from file or incapy constructor
 
+        # Sets the weights
+        self.next_window(0)
+
+        self.set_edge_threshold(self.edge_threshold)
+
         # The color attributes for the nodes
         self.hex_colors = None
         self.get_color_attributes()
 
-        # Repeat is by default false, meaning that after the last window, no more windows will be loaded
-        self.repeat = False
-
         # The time (in seconds) when to load the new window
         self.update_weight_time = update_weight_time
 
@@ -104,15 +204,69 @@ class GraphAlgorithm(IController):
             # Use that threshold
             self.edge_threshold = threshold
         try:
-            # Check directly from given values, without any transformation
-            # Can be changed to use transformed weights instead, if it becomes necessary
-            # to remove x_corr from memory
-            mask = self.loader.x_corr[self.current_window + 1] > self.edge_threshold
-            self.model.set_edge_threshold_mask(mask)
+            self.update_edge_index()
         # Nothing to do after last weight matrix reached
         # TODO: Implement stop or loop behavior after last matrix
         except IndexError:
-            pass
+            return
+
+        # All edges greater than the threshold are at the end of the sorted edges,
+        # displayed in their original order
+        first = np.searchsorted(self.sorted_x_corr, self.edge_threshold, side='right')
+        self.model.set_visible_edges(np.sort(self.sorted_edges[first:]))
+
+    def update_edge_index(self):
+        """
+        Sorts the edges by the cross-correlations of the current window, if not done yet.
+
+        :return: None
+
+        """
+
+        if self.edge_index_window == self.current_window:
+            return
+        self.sorted_edges, self.sorted_x_corr = self.sort_edges(self.current_window)
+        self.edge_index_window = self.current_window
+
+    def sort_edges(self, window):
+        """
+        Sorts the edges by the cross-correlations of a window.
+
+        :param window: int
+            The window
+        :return: tuple of two Numpy 1D arrays
+            The sorted edge indices and their cross-correlations, without edges whose
+            cross-correlation is NaN
+
+        """
+
+        # Check directly from given values, without any transformation
+        # Can be changed to use transformed weights instead, if it becomes necessary
+        # to remove x_corr from memory
+        x_corr = np.asarray(self.loader.x_corr[window + 1])
+        sorted_edges = np.argsort(x_corr, kind='stable')
+        sorted_x_corr = x_corr[sorted_edges]
+        # NaNs are sorted last and are never greater than a threshold, they are left out
+        num_values = len(sorted_x_corr) - np.count_nonzero(np.isnan(sorted_x_corr))
+        return sorted_edges[:num_values], sorted_x_corr[:num_values]
+
+    def load_window(self, window):
+        """
+        Loads everything needed to switch to a window: its weights and its sorted edges.
+        Called by the prefetcher, usually on its worker thread.
+
+        :param window: int
+            The window
+        :return: tuple
+            The weights, the hash of the weights (None without layout cache), the sorted edge
+            indices and their cross-correlations
+
+        """
+
+        weights = self.loader.weights[window]
+        # Hashing is O(E), it is only needed for the keys of the layout cache
+        digest = weights_hash(weights) if self.layout_cache is not None else None
+        return (weights, digest) + self.sort_edges(window)
 
     def set_anim_speed_const(self, value):
         """
@@ -127,6 +281,7 @@ class GraphAlgorithm(IController):
 
         self.anim_speed_const = value
         self.model.set_speed_constant(value)
+        self.wake()
 
     def set_update_weight_time(self, value):
         """
@@ -142,6 +297,7 @@ class GraphAlgorithm(IController):
         # Explicitly NOT reset time that current window has been used
         self.update_weight_time = value
         self.model.set_update_weight_time(value)
+        self.wake()
 
     def set_repeat(self, value):
         """
@@ -168,9 +324,20 @@ class GraphAlgorithm(IController):
         # TODO graph needs to know weights(cross_correlation) and edge_ids
         self.model.set_edges(self.loader.edge_ids)
         self.model.set_vertex_ids(self.loader.vertex_ids)
-        self.model.set_positions(self.loader.positions[:, 1:3])
+        self.model.set_positions(self.initial_positions())
         self.model.set_number_windows(self.loader.number_windows)
 
+    def initial_positions(self):
+        """
+        Returns the static vertex positions from the loader, which every layout starts from.
+
+        :return: Numpy 2D array, shape (X, 2)
+            A copy of the positions
+
+        """
+
+        return self.loader.positions[:, 1:3].astype(self.dtype)
+
     def calculate_weights(self):
         # calculate actual weights from x_corr
         # TODO Use Sigmoid function
@@ -185,37 +352,32 @@ class GraphAlgorithm(IController):
         """
 
         # First, get colors in LAB and then convert to RGB hex colors to pass to the model.
-        # TODO better way to calculate number of rows?
-        num_rows = 10#math.ceil(math.sqrt(len(self.loader.vertex_ids)))
+        # The electrodes are arranged on a square grid
+        num_vert = len(self.loader.vertex_ids)
+        num_rows = math.ceil(math.sqrt(num_vert))
 
         # constant
         # 100 here and 36 for l or 128 here and 20 for l
         f_lab_range = 100.0
 
-        colors_lab = np.ndarray((100, 3), dtype=float)
+        colors_lab = np.ndarray((num_vert, 3), dtype=float)
         colors_lab[:, 0] = 36
 
         pos = self.loader.positions[:, 1:3]
 
         colors_lab[:, 1:3] = ((2*f_lab_range*pos[:, 0:2])/num_rows) - f_lab_range
 
-        colors_res = []
-        # TODO not always 100?
-        for i in range(100):
-            currcol = colors_lab[i]
-            lab = LabColor(currcol[0], currcol[1], currcol[2])
-            res = convert_color(lab, sRGBColor)
-            colors_res.append(res.get_rgb_hex())
-
-        # Set the colors in the model
-        self.model.set_colors(colors_res)
+        # Set the colors in the model, all converted at once
+        self.model.set_colors(lab_to_hex(colors_lab))
 
-    def next_window(self, value=None):
+    def next_window(self, value=None, restore_layout=True):
         """
         Updates the weights with the current_window weights from the loader.
 
         :param: value
             The window to be loaded
+        :param restore_layout: bool
+            If 'True' and the window is jumped to (value is given), its cached layout is restored
 
         :return: None
 
@@ -224,6 +386,7 @@ class GraphAlgorithm(IController):
         # XXX Prevent deadlock due to notification upon change of slider
         if value == self.current_window:
             return
+        start = self.model.profiler.clock()
         if value is None:
             self.current_window += 1
             curr_window = self.current_window
@@ -233,16 +396,56 @@ class GraphAlgorithm(IController):
             self.current_window = value
         # sends the data to the model and update the matrix every few seconds
         try:
-            with self.mutex:
-                self.model.set_weights(self.loader.weights[curr_window], curr_window)
-                self.set_edge_threshold()
-                # New window has now been used for 0 seconds
-                # Thus this time needs to be reset in order not to move on too fast
-                # If this is not done, this window will be replaced by the next after a too short period of time
-                self.current_window_time = time.time()
+            # Usually prefetched already, else loaded without blocking the animation
+            weights, digest, sorted_edges, sorted_x_corr = self.prefetcher.get(curr_window)
         except IndexError:
+            if value is None:
+                # Stay at the last window, windows of a stream that have not arrived yet must not be skipped
+                self.current_window -= 1
             if self.repeat:
                 self.next_window(0)
+            return
+
+        positions = None
+        if digest is not None:
+            self.weight_hashes[curr_window] = digest
+            if value is not None and restore_layout:
+                positions = self.layout_cache.get(self.layout_cache_key(curr_window))
+
+        with self.mutex:
+            self.store_layout()
+            if positions is not None:
+                # The window continues from its previous layout, with its own weights right away
+                self.transition.cancel()
+                self.model.set_positions(positions)
+                self.model.set_weights(weights, curr_window)
+            else:
+                # The blend starts from the weights currently used
+                self.model.set_weights(self.transition.start(self.model.edge_weights, weights), curr_window)
+            self.positions_window = curr_window
+            self.window_steps = 0
+            self.sorted_edges = sorted_edges
+            self.sorted_x_corr = sorted_x_corr
+            self.edge_index_window = curr_window
+            self.set_edge_threshold()
+            # New window has now been used for 0 seconds
+            # Thus this time needs to be reset in order not to move on too fast
+            # If this is not done, this window will be replaced by the next after a too short period of time
+            self.current_window_time = time.time()
+            # The layout of the new window starts hot again
+            self.temperature = 1
+        self.model.profiler.record('window_switch', start)
+        self.wake()
+
+        # Windows of a stream keep arriving
+        if self.model.number_windows != self.loader.number_windows:
+            self.model.set_number_windows(self.loader.number_windows)
+
+        # Load the following window while this one is animated
+        next_window = curr_window + 1
+        if self.repeat and next_window >= self.loader.number_windows:
+            next_window = 0
+        self.prefetcher.prefetch(next_window)
 
         # TODO introduce error handling after last iteration of correlations
         # maybe call stop_iteration
@@ -255,10 +458,56 @@ class GraphAlgorithm(IController):
 
         """
 
-        self.populate_model()
+        # Starts from the layout of the first window, if it is known
+        positions = None
+        if self.layout_cache is not None and self.loader.number_windows > 0:
+            positions = self.layout_cache.get(self.layout_cache_key(0))
+
+        with self.mutex:
+            self.store_layout()
+            self.populate_model()
+            if positions is not None:
+                self.model.set_positions(positions)
+            self.positions_window = None
         self.current_window = -1
+        self.temperature = 1
+        self.transition.cancel()
         self.wait_event.clear()
         self.stop = False
+        self.wake()
+
+    def layout_cache_key(self, window):
+        """
+        Returns the key of the layout of a window in the layout cache: the layout depends on the
+        weights of the window and on the constants of the layout.
+
+        :param window: int
+            The window
+        :return: string
+            The key
+
+        """
+
+        if window not in self.weight_hashes:
+            self.weight_hashes[window] = weights_hash(self.loader.weights[window])
+        constants = (len(self.model.vertex_pos), self.repulsive_const, self.natural_spring_length,
+                     self.force_kernel, self.dtype.str)
+        return layout_key(window, self.weight_hashes[window], constants)
+
+    def store_layout(self):
+        """
+        Stores the current layout in the layout cache, as layout of the window it was laid out for.
+
+        :return: None
+
+        """
+
+        # Nothing has been laid out (yet), the positions are still those the window started from
+        if self.layout_cache is None or self.positions_window is None or self.window_steps == 0 \
+                or self.natural_spring_length is None:
+            return
+        self.layout_cache.put(self.layout_cache_key(self.positions_window), self.model.vertex_pos)
+        self.window_steps = 0
 
     def start_iteration(self):
         """
@@ -267,6 +516,16 @@ class GraphAlgorithm(IController):
         :return: None
 
         """
+
+        if self.run_thread is not None and self.run_thread.is_alive():
+            # Already running, only continue
+            if not self.stop:
+                self.continue_iteration()
+                return
+            # Stopping, but still finishing its current step: a new thread takes over once it has ended
+            self.run_thread.join()
+
+        self.stop = False
         self.wait_event.set()
         self.run_thread = threading.Thread(target=self.run_iteration)
         self.run_thread.start()
@@ -290,6 +549,9 @@ class GraphAlgorithm(IController):
 
         # TODO: Maybe catch Keyboard interrupt to output position
 
+        # Steps are paced to the tick rate, the thread sleeps in between
+        next_tick = last_time
+
         while True:
             # Wait for other events
             self.wait_event.wait()
@@ -297,6 +559,8 @@ class GraphAlgorithm(IController):
             if self.stop:
                 # stop the run_iteration
                 break
+            # Events from now on wake up the next sleep
+            self.wake_event.clear()
 
             # This makes the speed of the animation constant
             # Even if the framerate drops, vertices will move at about the same speed
@@ -306,7 +570,7 @@ class GraphAlgorithm(IController):
 
             # dt must be bounded, in case of string lag positions should not jump too far
             dt = min(dt, 0.1)
-            self.max_step_size = self.anim_speed_const*dt
+            self.max_step_size = self.anim_speed_const*dt*self.temperature
 
             # Load the new window, if the update_weight_time is reached
             if curr_time - self.current_window_time > self.update_weight_time:
@@ -319,7 +583,167 @@ class GraphAlgorithm(IController):
 
             with self.mutex:
                 # The function to calculate the new positions
+                step_start = self.model.profiler.clock()
                 self.do_step()
+                self.model.profiler.record('step', step_start)
+
+            if self.cooling is not None:
+                self.temperature *= self.cooling**dt
+                if self.is_converged(dt):
+                    self.sleep_until_event()
+                    # Time asleep does not count as time since the last step
+                    last_time = time.time()
+                    next_tick = last_time
+                    continue
+
+            if self.tick_rate:
+                # Sleep until the next step is due, without accumulating delays
+                next_tick = max(next_tick + 1 / self.tick_rate, time.time())
+                self.sleep_until(next_tick)
+
+    def is_converged(self, dt):
+        """
+        Returns whether the layout of the current window has converged, i.e. whether no vertex
+        moved faster than the tolerance in the last step.
+
+        :param dt: float
+            Time (in seconds) of the last step
+        :return: bool
+
+        """
+
+        return self.step_max is not None and \
+            self.step_max < self.convergence_tolerance*self.natural_spring_length*dt
+
+    def sleep_until_event(self):
+        """
+        Sleeps until the next window is due or a user event (see wake) occurs.
+
+        :return: None
+
+        """
+
+        timeout = None
+        if self.update_weight_time != 0:
+            timeout = max(self.update_weight_time - (time.time() - self.current_window_time), 0)
+        self.wake_event.wait(timeout)
+
+    def sleep_until(self, deadline):
+        """
+        Sleeps until the deadline or a user event (see wake).
+
+        :param deadline: float
+            Time (as by time.time) to sleep until
+
+        :return: None
+
+        """
+
+        self.wake_event.wait(max(deadline - time.time(), 0))
+
+    def wake(self):
+        """
+        Wakes up the animation if it sleeps on a converged layout.
+
+        :return: None
+
+        """
+
+        self.wake_event.set()
+
+    def layout_window(self, window, steps, dt, record_every=1, warm_start='previous'):
+        """
+        Runs a fixed number of steps of the layout on one window, with a fixed time per step
+        instead of the wall clock, so the result is deterministic. Used by the headless
+        batch mode; init_algorithm needs to be called first.
+
+        :param window: int
+            The window
+        :param steps: int
+            The number of steps
+        :param dt: float
+            Time (in seconds) per step, replaces the time since the last frame
+        :param record_every: int
+            Every how many steps the positions are recorded
+        :param warm_start: string
+            'previous' continues from the current positions, 'static' starts from the
+            static positions of the loader (then windows do not depend on each other)
+
+        :return: Numpy 3D array, shape (steps // record_every, X, 2)
+            The recorded vertex positions
+
+        """
+
+        if warm_start == 'static':
+            with self.mutex:
+                # The layout of the previous window is stored before it is replaced
+                self.store_layout()
+                self.model.set_positions(self.initial_positions())
+                # Laid out for the window from now on, also if it is the current window already
+                self.positions_window = window
+                self.window_steps = 0
+        elif warm_start != 'previous':
+            raise ValueError("Unknown warm start '{}'".format(warm_start))
+
+        # Batch layouts must not depend on the layouts seen before
+        self.next_window(window, restore_layout=False)
+        self.max_step_size = self.anim_speed_const*dt
+        self.step_max = None
+
+        frames = np.empty((steps // record_every, len(self.model.vertex_pos), 2), dtype=self.dtype)
+        for step in range(frames.shape[0] * record_every):
+            # A converged layout does not move anymore, its positions are kept
+            if self.cooling is None or not self.is_converged(dt):
+                with self.mutex:
+                    self.do_step()
+                if self.cooling is not None:
+                    self.temperature *= self.cooling**dt
+                    self.max_step_size = self.anim_speed_const*dt*self.temperature
+            if (step + 1) % record_every == 0:
+                frames[step // record_every] = self.model.vertex_pos
+        return frames
+
+    def compute_layouts(self, filename, steps_per_window, dt=0.05, windows=None, record_every=1,
+                        warm_start='previous'):
+        """
+        Headless batch mode: precomputes the layouts of all windows and writes the trajectory of
+        vertex positions to a file, which can be replayed without recomputing.
+        Must not be called while the animation is running.
+
+        :param filename: string
+            The filename of the trajectory, ending with '.h5', '.hdf5' or '.npz'
+        :param steps_per_window: int
+            The number of steps per window
+        :param dt: float
+            Time (in seconds) per step, 0.05 corresponds to a frame rate of 20Hz
+        :param windows: list
+            The windows to be computed, all windows by default
+        :param record_every: int
+            Every how many steps the positions are recorded
+        :param warm_start: string
+            'previous' starts each window from the last positions of the window before,
+            'static' starts every window from the static positions of the loader
+
+        :return: None
+
+        """
+
+        if windows is None:
+            windows = range(self.loader.number_windows)
+        windows = list(windows)
+
+        # All windows start from the static positions and use the spring length calculated from them
+        self.populate_model()
+        self.current_window = -1
+        self.init_algorithm()
+
+        with TrajectoryWriter(filename, windows, steps_per_window // record_every, self.loader.vertex_ids,
+                              self.dtype, steps_per_window=steps_per_window, dt=dt, record_every=record_every,
+                              warm_start=warm_start, anim_speed_const=self.anim_speed_const,
+                              repulsive_const=self.repulsive_const, force_kernel=self.force_kernel,
+                              natural_spring_length=self.natural_spring_length) as writer:
+            for index, window in enumerate(windows):
+                writer.write(index, self.layout_window(window, steps_per_window, dt, record_every, warm_start))
 
     def stop_iteration(self):
         """
@@ -329,6 +753,12 @@ class GraphAlgorithm(IController):
 
         """
         self.stop = True
+        with self.mutex:
+            # The layout of the last window can be restored later
+            self.store_layout()
+        # Also releases a paused animation, so it can stop
+        self.wait_event.set()
+        self.wake()
 
     def pause_iteration(self):
         """
@@ -339,6 +769,7 @@ class GraphAlgorithm(IController):
         """
 
         self.wait_event.clear()
+        self.wake()
 
     def continue_iteration(self):
         """
@@ -350,6 +781,20 @@ class GraphAlgorithm(IController):
 
         self.wait_event.set()
 
+    def close(self):
+        """
+        Stops the animation and the worker thread loading windows in the background. The controller
+        cannot be used afterwards.
+
+        :return: None
+
+        """
+
+        if self.run_thread is not None and self.run_thread.is_alive():
+            self.stop_iteration()
+            self.run_thread.join()
+        self.prefetcher.close()
+
     def _iterate(self):
         """
         Calculations for one time step.
@@ -386,35 +831,87 @@ class GraphAlgorithm(IController):
         self.calculate_spring_length()
         self.calculate_graph_center()
 
-    def calculate_spring_length(self):
+        if self.force_kernel == 'buffered':
+            self.allocate_work_buffers()
+
+    def allocate_work_buffers(self):
         """
-        Calculates the natrual spring length
+        Allocates the work buffers of the 'buffered' kernel for the current number of
+        vertices and form of the weights (full matrix or condensed).
 
         :return: None
 
         """
 
+        num_vert = len(self.model.vertex_pos)
+        condensed = np.ndim(self.model.edge_weights) == 1
+        dtype = self.dtype
+        # One entry per pair of vertices
+        pair_shape = (len(condensed_pairs(num_vert)[0]),) if condensed else (num_vert, num_vert)
+
+        self.work_buffers = {
+            'num_vert': num_vert,
+            'condensed': condensed,
+            'diff_x': np.empty(pair_shape, dtype=dtype),
+            'diff_y': np.empty(pair_shape, dtype=dtype),
+            'length': np.empty(pair_shape, dtype=dtype),
+            'force': np.empty(pair_shape, dtype=dtype),
+            'scratch': np.empty(pair_shape, dtype=dtype),
+            'is_zero': np.empty(pair_shape, dtype=bool),
+            'displacement': np.empty((num_vert, 2), dtype=dtype),
+            'displacement_length': np.empty(num_vert, dtype=dtype),
+            'step_scale': np.empty(num_vert, dtype=dtype),
+            'center': np.empty(2, dtype=dtype),
+            'positions': np.empty((num_vert, 2), dtype=dtype),
+        }
+
+    def calculate_spring_length(self, block_size=2**20):
+        """
+        Calculates the natrual spring length: 1.5 times the mean length of all edges (including
+        the self loops) at the static positions, so it does not change with the layout (e.g. when
+        starting again from a restored layout). The lengths of all edges are calculated at once, in
+        blocks of bounded memory. The result is kept for the positions and edges it was calculated
+        from, so starting again does not calculate it again.
+
+        :param block_size: int
+            The number of edges whose lengths are calculated at once
+
+        :return: None
+
+        """
+
+        positions = self.initial_positions()
+        edges = np.asarray(self.model.edges)
+        # Hashing the positions is O(X), the edges of the loader do not change
+        positions_hash = weights_hash(positions)
+        if self.spring_length_key is not None and self.spring_length_key[0] is edges \
+                and self.spring_length_key[1] == positions_hash:
+            return
+
         # Calculate sum of edge lengths
-        sum_edge_lengths = 0
-        for nodes in self.model.edges:
-            vector_0 = self.model.vertex_pos[nodes[0]]
-            vector_1 = self.model.vertex_pos[nodes[1]]
-            sum_edge_lengths += self._vector_length(vector_0-vector_1)
-        self.natural_spring_length = 1.5 * sum_edge_lengths/len(self.model.edges.T[0])
+        sum_edge_lengths = 0.0
+        for first in range(0, len(edges), block_size):
+            block = edges[first:first + block_size]
+            diff = positions[block[:, 0]] - positions[block[:, 1]]
+            lengths = np.sqrt(np.sum(diff**2, axis=-1).astype(float))
+            # Summed up one edge after the other (not pairwise as by np.sum), the layout is sensitive
+            # to the last bits of the spring length and stays reproducible this way
+            sum_edge_lengths = np.cumsum(np.concatenate(([sum_edge_lengths], lengths)))[-1]
+        self.natural_spring_length = float(1.5 * sum_edge_lengths/len(edges))
+        self.spring_length_key = (edges, positions_hash)
 
     def calculate_graph_center(self):
         """
-        Calculates the graph center.
+        Calculates the graph center: the center of the bounding box of the static vertex positions.
 
         :return: None
 
         """
 
-        # TODO Calculate graph center
-        self.graph_center = (4.5, 4.5)
+        positions = self.initial_positions()
+        center = (positions.min(axis=0) + positions.max(axis=0)) / 2
+        self.graph_center = (float(center[0]), float(center[1]))
 
-    # Numpy mashgrid
-    # Broadcasting
     def do_step(self):
         """
         Force-directed graph layout algorithm. Calculates the new positions of
@@ -424,6 +921,99 @@ class GraphAlgorithm(IController):
 
         """
 
+        self.window_steps += 1
+        if self.transition.is_active():
+            self.advance_transition()
+
+        if self.force_kernel == 'buffered':
+            self._buffered_step()
+            return
+
+        # Sum of repulsive and attractive forces per vertex
+        if isinstance(self.model.edge_weights, SparseWeights):
+            displacement = self._sparse_displacement()
+        elif self.force_kernel == 'grid':
+            displacement = self.grid_forces.displacement(self.model.vertex_pos, np.asarray(self.model.edge_weights),
+                                                         self.natural_spring_length, self.repulsive_const)
+        elif np.ndim(self.model.edge_weights) == 1:
+            displacement = self._condensed_displacement()
+        else:
+            displacement = self._dense_displacement()
+
+        # Make sure length of displacement fits
+        # Own matrix for length calculations analogous to diff
+        displacement_length = displacement**2
+        displacement_length = np.sqrt(np.sum(displacement_length, axis=-1))
+
+        # Normalize displacements
+        displacement = displacement/displacement_length[:, np.newaxis]
+
+        # Displacements are capped at certain length
+        # If their length is less than max_step_size, nothing changes, otherwise their length will be max_step_size
+        step_length = np.minimum(displacement_length, self.max_step_size)
+        self._record_step(step_length)
+        displacement *= step_length[:, np.newaxis]
+
+        # Now update new_vertex_positions with displacment vectors per source vertex
+        new_vertex_pos = self.model.vertex_pos + displacement
+
+        # Force everything around a common center
+        # Sum all positions
+        # Axis 0 or 1 indexed? FIRST AXIS!!!
+        diff_to_center = np.sum(self.model.vertex_pos, axis=-2)
+        # Average of all positions is 'middle' of graph
+        diff_to_center /= len(self.model.vertex_ids)
+        # Difference of middle of graph to predefined center
+        diff_to_center -= self.graph_center
+
+        # Move all towards center such that 'middle' of graph eventually becomes equal to center
+        # anim_speed_const needs to be bounded here because else the vertices will overshoot the center
+        new_vertex_pos = new_vertex_pos - diff_to_center[np.newaxis, :] * min(self.anim_speed_const, 1)
+
+        # Set the new vertex positions
+        self.model.set_vertex_pos(new_vertex_pos)
+
+    def advance_transition(self):
+        """
+        Moves the weights one step further in the transition to the current window.
+
+        :return: None
+
+        """
+
+        weights = self.transition.advance()
+        if weights is not None:
+            # Finished, the weights of the window are used directly
+            self.model.edge_weights = weights
+        # Weights derived from the blended weights are outdated
+        self.model.dense_edge_weights = None
+        self.grid_forces.weights = None
+
+    def _record_step(self, step_length):
+        """
+        Keeps the largest and the mean step of the vertices for the convergence monitor.
+
+        :param step_length: Numpy 1D array
+            The length of the step of every vertex
+
+        :return: None
+
+        """
+
+        self.step_max = float(np.max(step_length))
+        self.step_mean = float(np.mean(step_length))
+
+    # Numpy mashgrid
+    # Broadcasting
+    def _dense_displacement(self):
+        """
+        Calculates the displacement of all vertices from the full weight matrix.
+
+        :return: Numpy 2D array, shape (X, 2)
+            The summed up forces per vertex
+
+        """
+
         # TODO: Check if copy is needed???
 
         # Get all positions twice: for target and source; reshape so they can be broadcast together by numpy
@@ -459,36 +1049,173 @@ class GraphAlgorithm(IController):
 
         # Displacement was calculated for each pair of vectors
         # Now need to sum over all target vertices for all source vertices
-        displacement = np.sum(displacement, axis=-2)
+        return np.sum(displacement, axis=-2)
 
-        # Make sure length of displacement fits
-        # Own matrix for length calculations analogous to diff
-        displacement_length = displacement**2
-        displacement_length = np.sqrt(np.sum(displacement_length, axis=-1))
+    def _condensed_displacement(self, weights=None):
+        """
+        Calculates the displacement of all vertices from the condensed weights.
+        Every pair of vertices is only evaluated once, its force is then applied to
+        both vertices with opposite signs.
 
-        # Normalize displacements
-        displacement = displacement/displacement_length[:, np.newaxis]
+        :param weights: Numpy 1D array or float
+            The condensed weights, or the same weight for all pairs; the weights of the model by default
+        :return: Numpy 2D array, shape (X, 2)
+            The summed up forces per vertex
 
-        # Displacements are capped at certain length
-        # If their length is less than max_step_size, nothing changes, otherwise their length will be max_step_size
-        displacement *= np.minimum(displacement_length[:, np.newaxis],
-                                   np.full_like(displacement_length[:, np.newaxis], self.max_step_size))
+        """
 
-        # Now update new_vertex_positions with displacment vectors per source vertex
-        new_vertex_pos = self.model.vertex_pos + displacement
+        if weights is None:
+            weights = self.model.edge_weights
+        num_vert = len(self.model.vertex_pos)
+        sources, targets = condensed_pairs(num_vert)
 
-        # Force everything around a common center
-        # Sum all positions
-        # Axis 0 or 1 indexed? FIRST AXIS!!!
-        diff_to_center = np.sum(self.model.vertex_pos, axis=-2)
-        # Average of all positions is 'middle' of graph
-        diff_to_center /= len(self.model.vertex_ids)
-        # Difference of middle of graph to predefined center
-        diff_to_center -= self.graph_center
+        # Difference vector for each pair of vertices
+        diff = self.model.vertex_pos[sources] - self.model.vertex_pos[targets]
+        diff_length = np.sqrt(np.sum(diff**2, axis=-1))
+        # Avoid division of 0/0 (e.g. on the diagonal)
+        diff_length[diff_length == 0] = 1
+        # Normalize all difference vectors
+        diff /= diff_length[:, np.newaxis]
+
+        # Repulsive force as a function of distance and edge weight, minus attractive force
+        force = self.repulsive_const*(self.natural_spring_length**2)/diff_length
+        force *= weights
+        force -= diff_length ** 2 / self.natural_spring_length
+        diff *= force[:, np.newaxis]
+
+        # Sum over the pairs for all source vertices, the targets get the opposite displacement
+        displacement = np.empty((num_vert, 2), dtype=self.model.vertex_pos.dtype)
+        for axis in range(2):
+            displacement[:, axis] = (np.bincount(sources, diff[:, axis], minlength=num_vert)
+                                     - np.bincount(targets, diff[:, axis], minlength=num_vert))
+        return displacement
+
+    def _sparse_displacement(self):
+        """
+        Calculates the displacement of all vertices from sparse weights: all pairs of vertices
+        with the default weight (exact or by the 'grid' kernel), corrected for the kept pairs,
+        whose weight differs from the default weight. The correction only evaluates the kept pairs.
 
-        # Move all towards center such that 'middle' of graph eventually becomes equal to center
-        # anim_speed_const needs to be bounded here because else the vertices will overshoot the center
-        new_vertex_pos = new_vertex_pos - diff_to_center[np.newaxis, :] * min(self.anim_speed_const, 1)
+        :return: Numpy 2D array, shape (X, 2)
+            The summed up forces per vertex
+
+        """
+
+        weights = self.model.edge_weights
+        positions = self.model.vertex_pos
+        num_vert = len(positions)
+        default_weight = np.asarray(weights.default_weight, dtype=positions.dtype)
+
+        if self.force_kernel == 'grid':
+            displacement = self.grid_forces.displacement(positions, default_weight, self.natural_spring_length,
+                                                         self.repulsive_const)
+        else:
+            displacement = self._condensed_displacement(default_weight)
+
+        # Difference vector for each kept pair
+        diff = positions[weights.sources] - positions[weights.targets]
+        diff_length = np.sqrt(np.sum(diff**2, axis=-1))
+        # Avoid division of 0/0
+        diff_length[diff_length == 0] = 1
+        diff /= diff_length[:, np.newaxis]
+
+        # Repulsive force is linear in the weight, only the difference to the default weight is missing
+        force = self.repulsive_const*(self.natural_spring_length**2)/diff_length
+        force *= weights.weights - default_weight
+        diff *= force[:, np.newaxis]
+
+        for axis in range(2):
+            displacement[:, axis] += (np.bincount(weights.sources, diff[:, axis], minlength=num_vert)
+                                      - np.bincount(weights.targets, diff[:, axis], minlength=num_vert))
+        return displacement
+
+    def _buffered_step(self):
+        """
+        Same as do_step with the exact forces, but computed in place in the preallocated
+        work buffers. Only arrays of the size of the number of vertices are allocated
+        (for summing up condensed weights).
+
+        :return: None
+
+        """
+
+        buffers = self.work_buffers
+        num_vert = len(self.model.vertex_pos)
+        condensed = np.ndim(self.model.edge_weights) == 1
+        # (Re)allocate if the number of vertices or the form of the weights changed
+        if buffers is None or buffers['num_vert'] != num_vert or buffers['condensed'] != condensed:
+            self.allocate_work_buffers()
+            buffers = self.work_buffers
+
+        # Positions are updated in place, so they need to be owned by the controller
+        # (e.g. not the initial positions of the loader)
+        positions = buffers['positions']
+        if self.model.vertex_pos is not positions:
+            np.copyto(positions, self.model.vertex_pos)
+
+        diff_x = buffers['diff_x']
+        diff_y = buffers['diff_y']
+        length = buffers['length']
+        force = buffers['force']
+        scratch = buffers['scratch']
+        is_zero = buffers['is_zero']
+
+        # Difference vector for each pair of vertices, split into x and y
+        if condensed:
+            sources, targets = condensed_pairs(num_vert)
+            for diff, axis in ((diff_x, 0), (diff_y, 1)):
+                # Indices are always valid, mode 'clip' avoids the buffering of 'out' by np.take
+                np.take(positions[:, axis], sources, out=diff, mode='clip')
+                np.take(positions[:, axis], targets, out=scratch, mode='clip')
+                diff -= scratch
+        else:
+            np.subtract(positions[:, np.newaxis, 0], positions[np.newaxis, :, 0], out=diff_x)
+            np.subtract(positions[:, np.newaxis, 1], positions[np.newaxis, :, 1], out=diff_y)
+
+        np.hypot(diff_x, diff_y, out=length)
+        # Avoid division of 0/0
+        np.equal(length, 0, out=is_zero)
+        np.putmask(length, is_zero, 1)
+
+        # Repulsive force as a function of distance and edge weight, minus attractive force
+        np.divide(self.repulsive_const*(self.natural_spring_length**2), length, out=force)
+        force *= self.model.edge_weights
+        np.multiply(length, length, out=scratch)
+        scratch /= self.natural_spring_length
+        force -= scratch
+        # Normalizes the difference vectors
+        force /= length
+        diff_x *= force
+        diff_y *= force
+
+        # Sum over the target vertices for all source vertices
+        displacement = buffers['displacement']
+        for diff, axis in ((diff_x, 0), (diff_y, 1)):
+            if condensed:
+                # The targets get the opposite displacement
+                np.subtract(np.bincount(sources, diff, minlength=num_vert),
+                            np.bincount(targets, diff, minlength=num_vert), out=displacement[:, axis])
+            else:
+                np.sum(diff, axis=-1, out=displacement[:, axis])
+
+        # Displacements are capped at max_step_size
+        displacement_length = buffers['displacement_length']
+        step_scale = buffers['step_scale']
+        np.hypot(displacement[:, 0], displacement[:, 1], out=displacement_length)
+        np.minimum(displacement_length, self.max_step_size, out=step_scale)
+        self._record_step(step_scale)
+        np.divide(step_scale, displacement_length, out=step_scale, where=displacement_length != 0)
+        displacement *= step_scale[:, np.newaxis]
+
+        # Force everything around a common center, using the 'middle' of the graph before the step
+        center = buffers['center']
+        np.sum(positions, axis=-2, out=center)
+        center /= len(self.model.vertex_ids)
+        center -= self.graph_center
+        center *= min(self.anim_speed_const, 1)
+
+        positions += displacement
+        positions -= center
 
         # Set the new vertex positions
-        self.model.set_vertex_pos(new_vertex_pos)
+        self.model.set_vertex_pos(positions)
@@ -1,5 +1,9 @@
 
 from .imodel import IModel
+from .condensed import condensed_to_square, square_to_condensed
+from .sparse import SparseWeights
+import threading
+import time
 import numpy as np
 
 
@@ -22,7 +26,10 @@ class GraphModel(IModel):
         self.edges = np.ndarray((0, 2))
 
         # mapping from vertex_indices to matrix_indices!! (e.g. missing node)
+        # Either a 2D weight matrix, its condensed upper triangle (1D) or SparseWeights
         self.edge_weights = []
+        # Dense matrix expanded from condensed weights, built on request only
+        self.dense_edge_weights = None
 
         self.vertex_ids = []
         self.vertex_pos = []
@@ -35,12 +42,30 @@ class GraphModel(IModel):
         self.time_to_update_weights = 5
         self.repeat = False
 
-        # Will be filled as boolean array indicating which edges surpass the threshold
-        self.edge_threshold_mask = []
+        # Will be filled with the indices of the edges that surpass the threshold
+        self.visible_edges = np.array([], dtype=np.intp)
+        # Sources and targets of the visible edges, only recomputed when edges or threshold change
+        self.edge_sources = []
+        self.edge_targets = []
 
         # The number of windows
         self.number_windows = None
 
+        # Maximum number of view updates per second, None updates the views on every change
+        self.render_rate = None
+        # Set if the views have not seen the latest state yet, guarded by update_condition
+        self.update_pending = False
+        # Copy of the positions of the pending update, the positions may change in place until it is rendered
+        self.pending_positions = None
+        self.update_condition = threading.Condition()
+        self.last_update_time = 0
+        # Number of states that were replaced by a newer one before being rendered
+        self.dropped_updates = 0
+        self.render_thread = None
+
+        # Frames that were never rendered (see set_render_rate)
+        self.profiler.add_counter('dropped_updates', lambda: self.dropped_updates)
+
     def add_listener(self, view):
         """
         Adds the view to the list of listeners.
@@ -54,23 +79,123 @@ class GraphModel(IModel):
 
         self.listeners.append(view)
 
-    def _update_view(self):
+    def _update_view(self, positions=None):
         """
         Updates all the views.
 
+        :param positions: Numpy 2D array, shape (X, 2)
+            A copy of the positions to be shown, the current positions by default
+
+        :return: None
+
+        """
+        start = self.profiler.clock()
+        if positions is None:
+            positions = np.array(self.vertex_pos)
+        for l in self.listeners:
+            l.update(((self.edge_sources, self.edge_targets),
+                      (positions, self.vertex_ids)))
+        self.profiler.record('render', start)
+
+    def _filter_edges(self):
+        """
+        Selects the sources and targets of the visible edges.
+
         :return: None
 
         """
+
+        start = self.profiler.clock()
         try:
-            edge_sources = np.compress(self.edge_threshold_mask, self.edges, axis=0).T[0]
-            edge_targets = np.compress(self.edge_threshold_mask, self.edges, axis=0).T[1]
-        # If any(self.edge_threshold_mask) is False, indexing an empty array is impossible
+            visible = np.asarray(self.edges)[self.visible_edges]
+            self.edge_sources = visible.T[0]
+            self.edge_targets = visible.T[1]
+        # If the edges are not set yet, indexing them is impossible
         except IndexError:
-            edge_sources = []
-            edge_targets = []
-        for l in self.listeners:
-            l.update(((edge_sources, edge_targets),
-                      (np.array(self.vertex_pos), self.vertex_ids)))
+            self.edge_sources = []
+            self.edge_targets = []
+        self.profiler.record('filter_edges', start)
+
+    def set_render_rate(self, render_rate):
+        """
+        Limits the number of view updates per second. Changes in between are coalesced: the views
+        are updated with the latest state only, states that were never rendered are dropped.
+        The layout is calculated independently of the render rate.
+
+        :param render_rate: float
+            Maximum number of view updates per second, None to update the views on every change
+
+        :return: None
+
+        """
+
+        with self.update_condition:
+            self.render_rate = render_rate
+            if render_rate and self.render_thread is None:
+                self.render_thread = threading.Thread(target=self._render_loop, daemon=True)
+                self.render_thread.start()
+            # Wake the render thread, so a pending update is flushed with the new rate
+            self.update_condition.notify()
+        if not render_rate:
+            self._flush_update()
+
+    def _request_update(self):
+        """
+        Updates the views, or marks the state as changed for the render thread if the
+        render rate is limited.
+
+        :return: None
+
+        """
+
+        if not self.render_rate:
+            self._update_view()
+            return
+
+        # The 'buffered' kernel moves the positions in place (on the animation thread), so they are
+        # copied now, in a consistent state, instead of by the render thread in the middle of a step
+        positions = np.array(self.vertex_pos)
+        with self.update_condition:
+            if self.update_pending:
+                self.dropped_updates += 1
+            self.update_pending = True
+            self.pending_positions = positions
+            self.update_condition.notify()
+
+    def _flush_update(self):
+        """
+        Updates the views if they have not seen the latest state yet.
+
+        :return: None
+
+        """
+
+        with self.update_condition:
+            pending = self.update_pending
+            positions = self.pending_positions
+            self.update_pending = False
+            self.pending_positions = None
+            self.last_update_time = time.time()
+        if pending:
+            self._update_view(positions)
+
+    def _render_loop(self):
+        """
+        Updates the views with the latest state at most render_rate times per second.
+        Runs in the render thread.
+
+        :return: None
+
+        """
+
+        while True:
+            with self.update_condition:
+                while not (self.update_pending and self.render_rate):
+                    self.update_condition.wait()
+                delay = self.last_update_time + 1 / self.render_rate - time.time()
+            if delay > 0:
+                time.sleep(delay)
+            self._flush_update()
 
     def set_colors(self, colors):
         """
@@ -98,6 +223,7 @@ class GraphModel(IModel):
 
         """
 
+        self.number_windows = number_windows
         self.update_ui_elements("window_adjust", number_windows)
 
     def set_speed_constant(self, speed_constant):
@@ -138,7 +264,7 @@ class GraphModel(IModel):
 
         # TODO: If not numpy array need to loop to set
         self.vertex_pos = positions
-        self._update_view()
+        self._request_update()
 
     def update_ui_elements(self, msg, value=None):
         """
@@ -174,13 +300,14 @@ class GraphModel(IModel):
         """
         Sets the weights.
 
-        :param weights: Numpy 2D array
-            2D weight matrix
+        :param weights: Numpy 2D or 1D array, or SparseWeights
+            2D weight matrix, its condensed upper triangle (see incapy.condensed) or sparse weights
         :return: None
 
         """
 
         self.edge_weights = weights
+        self.dense_edge_weights = None
         self.update_ui_elements("window_change", window)
 
     # might not be needed
@@ -202,7 +329,7 @@ class GraphModel(IModel):
         # Mapping from index to the vertex_id
         self.vertex_index_to_id = {index: id for id, index in enumerate(self.vertex_ids)}
 
-        self._update_view()
+        self._request_update()
 
     def set_edges(self, edges):
         """
@@ -216,18 +343,39 @@ class GraphModel(IModel):
 
         # TODO: Check if needs to be done together with weights
         self.edges = edges
-        self._update_view()
+        self._filter_edges()
+        self._request_update()
 
-    def get_weights(self):
+    def get_weights(self, condensed=False):
         """
         Returns the weights
 
-        :return: Numpy 2D array
+        :param condensed: bool
+            If 'True', the condensed upper triangle is returned, else the full matrix
+        :return: Numpy 2D or 1D array
             The edge weights
 
         """
 
-        return self.edge_weights
+        if isinstance(self.edge_weights, SparseWeights):
+            if condensed:
+                return self.edge_weights.to_condensed()
+            if self.dense_edge_weights is None:
+                self.dense_edge_weights = self.edge_weights.to_dense()
+            return self.dense_edge_weights
+
+        weights = np.asarray(self.edge_weights)
+        is_condensed = weights.ndim == 1
+
+        if condensed:
+            return weights if is_condensed else square_to_condensed(weights)
+        if not is_condensed:
+            return weights
+
+        # Expand only once per window
+        if self.dense_edge_weights is None:
+            self.dense_edge_weights = condensed_to_square(weights, len(self.vertex_ids))
+        return self.dense_edge_weights
 
     def set_edge_threshold_mask(self, mask):
         """
@@ -241,8 +389,22 @@ class GraphModel(IModel):
 
         """
 
-        self.edge_threshold_mask = mask
-        self._update_view()
+        self.set_visible_edges(np.flatnonzero(mask))
+
+    def set_visible_edges(self, indices):
+        """
+        Sets the edges that will be displayed.
+
+        :param indices: Numpy 1D array
+            The indices of the displayed edges in the array of all edges
+
+        :return: None
+
+        """
+
+        self.visible_edges = indices
+        self._filter_edges()
+        self._request_update()
 
     def set_vertex_pos(self, vertex_positions):
         """
@@ -256,4 +418,4 @@ class GraphModel(IModel):
         """
 
         self.vertex_pos = vertex_positions
-        self._update_view()
+        self._request_update()
@@ -0,0 +1,249 @@
+import math
+import numpy as np
+
+
+class GridForces:
+    """
+    Approximate forces for the force-directed layout on a hierarchy of uniform grids
+    (a quadtree stored level by level).
+
+    Pairs of vertices in the same or in neighbouring cells of the finest grid are
+    evaluated exactly. All other vertices are combined per cell: on each level, a vertex
+    interacts with the cells that are children of its parent's neighbours but not neighbours
+    of its own cell (Barnes-Hut style interaction lists). Every pair of vertices is thus
+    accounted for exactly once and the cost per step is O(V log V). The forces of a cell are
+    expanded around its centroid, optionally up to second order (quadrupole).
+
+    Far away cells cannot use the weight of each single pair. Instead, the weight of a pair
+    is approximated by the mean weight of the vertex in the far cell.
+
+    """
+
+    def __init__(self, leaf_size=16, quadrupole=True):
+        """
+        Constructor for the GridForces class.
+
+        :param leaf_size: int
+            The average number of vertices per cell of the finest grid
+        :param quadrupole: bool
+            If 'True', the spread of the vertices in a cell is taken into account (more accurate),
+            else only their centroid (faster)
+
+        """
+
+        self.leaf_size = leaf_size
+        self.quadrupole = quadrupole
+
+        # Weights of the current window and the mean weight of every vertex derived from them
+        self.weights = None
+        self.mean_weights = None
+
+    def _update_weights(self, weights, num_vert):
+        """
+        Calculates the mean weight of every vertex, once per window.
+
+        :param weights: Numpy 2D, 1D or 0D array
+            The weight matrix, its condensed upper triangle or the same weight for all pairs
+        :param num_vert: int
+            The number of vertices
+
+        :return: None
+
+        """
+
+        if weights is self.weights:
+            return
+
+        self.weights = weights
+        if weights.ndim == 0:
+            self.mean_weights = np.full(num_vert, weights)
+        elif weights.ndim == 2:
+            self.mean_weights = np.mean(weights, axis=-1)
+        else:
+            # Sum up every pair for both of its vertices, the diagonal only once
+            num_vert = int((math.isqrt(8*len(weights) + 1) - 1) // 2)
+            sources, targets = np.triu_indices(num_vert)
+            off_diagonal = np.where(sources == targets, 0, weights)
+            self.mean_weights = (np.bincount(sources, weights, minlength=num_vert)
+                                 + np.bincount(targets, off_diagonal, minlength=num_vert)) / num_vert
+
+    def displacement(self, positions, weights, natural_spring_length, repulsive_const):
+        """
+        Calculates the approximate displacement of all vertices.
+
+        :param positions: Numpy 2D array, shape (X, 2)
+            The vertex positions
+        :param weights: Numpy 2D, 1D or 0D array
+            The weight matrix, its condensed upper triangle or the same weight for all pairs
+        :param natural_spring_length: float
+            The natural spring length
+        :param repulsive_const: float
+            The repulsive constant
+
+        :return: Numpy 2D array, shape (X, 2)
+            The summed up forces per vertex
+
+        """
+
+        num_vert = len(positions)
+        self._update_weights(weights, num_vert)
+
+        # Number of levels such that the finest cells hold about leaf_size vertices
+        levels = max(0, math.ceil(math.log(max(num_vert / self.leaf_size, 1), 4)))
+        grid_size = 2**levels
+
+        # Cell coordinates of every vertex on the finest grid (square cells)
+        lower = positions.min(axis=0)
+        extent = max(np.max(positions.max(axis=0) - lower), 1e-12)
+        cells = np.minimum(((positions - lower) * (grid_size / extent)).astype(np.intp), grid_size - 1)
+
+        displacement = self._near_field(positions, weights, cells, grid_size, natural_spring_length,
+                                        repulsive_const)
+
+        for level in range(2, levels + 1):
+            displacement += self._far_field(positions, cells >> (levels - level), 2**level,
+                                            natural_spring_length, repulsive_const)
+
+        return displacement
+
+    def _near_field(self, positions, weights, cells, grid_size, natural_spring_length, repulsive_const):
+        """
+        Exact forces between all vertices in the same or in neighbouring cells of the finest grid.
+
+        :return: Numpy 2D array, shape (X, 2)
+            The summed up forces per vertex
+
+        """
+
+        num_vert = len(positions)
+
+        # Sort vertices by cell, members of a cell are then contiguous
+        cell_ids = cells[:, 1] * grid_size + cells[:, 0]
+        order = np.argsort(cell_ids, kind='stable')
+        sorted_cells = cells[order]
+        ends = np.cumsum(np.bincount(cell_ids, minlength=grid_size**2))
+        starts = ends - np.bincount(cell_ids, minlength=grid_size**2)
+
+        # Each pair of cells is visited once: the own cell and half of the neighbours
+        sources = []
+        targets = []
+        for dx, dy in ((0, 0), (1, 0), (-1, 1), (0, 1), (1, 1)):
+            x = sorted_cells[:, 0] + dx
+            y = sorted_cells[:, 1] + dy
+            valid = (x >= 0) & (x < grid_size) & (y < grid_size)
+            neighbour = np.where(valid, y * grid_size + x, 0)
+
+            if dx == 0 and dy == 0:
+                # Only the following members of the own cell
+                begin = np.arange(1, num_vert + 1)
+            else:
+                begin = starts[neighbour]
+            counts = np.where(valid, ends[neighbour] - begin, 0)
+
+            # Expand every vertex into one pair per member of the neighbouring cell
+            total = np.sum(counts)
+            first = np.repeat(np.cumsum(counts) - counts, counts)
+            sources.append(np.repeat(np.arange(num_vert), counts))
+            targets.append(np.repeat(begin, counts) + np.arange(total) - first)
+
+        sources = order[np.concatenate(sources)]
+        targets = order[np.concatenate(targets)]
+
+        if weights.ndim == 0:
+            pair_weights = weights
+        elif weights.ndim == 2:
+            pair_weights = weights[sources, targets]
+        else:
+            # Position of the pair in the condensed upper triangle
+            low = np.minimum(sources, targets)
+            high = np.maximum(sources, targets)
+            pair_weights = weights[low * num_vert - low * (low - 1) // 2 + high - low]
+
+        diff = positions[sources] - positions[targets]
+        diff_length = np.sqrt(np.sum(diff**2, axis=-1))
+        # Avoid division of 0/0
+        diff_length[diff_length == 0] = 1
+        diff /= diff_length[:, np.newaxis]
+
+        # Repulsive force as a function of distance and edge weight, minus attractive force
+        force = repulsive_const*(natural_spring_length**2)/diff_length*pair_weights
+        force -= diff_length ** 2 / natural_spring_length
+        diff *= force[:, np.newaxis]
+
+        # Both vertices of a pair get the force with opposite signs
+        displacement = np.empty((num_vert, 2), dtype=positions.dtype)
+        for axis in range(2):
+            displacement[:, axis] = (np.bincount(sources, diff[:, axis], minlength=num_vert)
+                                     - np.bincount(targets, diff[:, axis], minlength=num_vert))
+        return displacement
+
+    def _far_field(self, positions, cells, grid_size, natural_spring_length, repulsive_const):
+        """
+        Approximate forces of the cells in the interaction list of every vertex on one level.
+
+        :return: Numpy 2D array, shape (X, 2)
+            The summed up forces per vertex
+
+        """
+
+        # Aggregates per cell: number of vertices, centroid, weight mass and second moments
+        cell_ids = cells[:, 1] * grid_size + cells[:, 0]
+        num_cells = grid_size**2
+        count = np.bincount(cell_ids, minlength=num_cells)
+        mass = np.bincount(cell_ids, self.mean_weights, minlength=num_cells)
+        centroid = np.empty((num_cells, 2))
+        for axis in range(2):
+            centroid[:, axis] = np.bincount(cell_ids, positions[:, axis], minlength=num_cells)
+        centroid /= np.maximum(count, 1)[:, np.newaxis]
+        # Spread of the vertices around the centroid (xx, xy, yy)
+        moments = np.zeros((num_cells, 3))
+        if self.quadrupole:
+            for index, (a, b) in enumerate(((0, 0), (0, 1), (1, 1))):
+                moments[:, index] = (np.bincount(cell_ids, positions[:, a] * positions[:, b], minlength=num_cells)
+                                     - count * centroid[:, a] * centroid[:, b])
+
+        # Candidates are the 6x6 children of the neighbours of the parent cell
+        offsets = np.arange(-2, 4)
+        x = ((cells[:, 0] >> 1) * 2)[:, np.newaxis, np.newaxis] + offsets[np.newaxis, :, np.newaxis]
+        y = ((cells[:, 1] >> 1) * 2)[:, np.newaxis, np.newaxis] + offsets[np.newaxis, np.newaxis, :]
+        x, y = np.broadcast_arrays(x, y)
+        x = x.reshape(len(cells), -1)
+        y = y.reshape(len(cells), -1)
+
+        # Neighbours of the own cell are handled on the next finer level
+        valid = (x >= 0) & (x < grid_size) & (y >= 0) & (y < grid_size)
+        valid &= (np.abs(x - cells[:, 0:1]) > 1) | (np.abs(y - cells[:, 1:2]) > 1)
+        candidates = np.where(valid, y * grid_size + x, 0)
+        valid &= count[candidates] > 0
+
+        diff = positions[:, np.newaxis, :] - centroid[candidates]
+        squared_length = np.sum(diff**2, axis=-1)
+        squared_length[~valid] = 1
+        diff_length = np.sqrt(squared_length)
+
+        # Second order (quadrupole) terms of the expansion around the centroid:
+        # trace of the moments and the moments applied to the difference vector
+        cell_moments = moments[candidates]
+        trace = cell_moments[..., 0] + cell_moments[..., 2]
+        moment_diff = np.stack((cell_moments[..., 0] * diff[..., 0] + cell_moments[..., 1] * diff[..., 1],
+                                cell_moments[..., 1] * diff[..., 0] + cell_moments[..., 2] * diff[..., 1]), axis=-1)
+        diff_moment_diff = np.sum(diff * moment_diff, axis=-1)
+
+        # Attraction (length * difference vector per vertex of the cell)
+        attraction = diff * (count[candidates] * diff_length + (trace / 2 - diff_moment_diff / (2 * squared_length))
+                             / diff_length)[..., np.newaxis]
+        attraction += moment_diff / diff_length[..., np.newaxis]
+        attraction /= natural_spring_length
+
+        # Repulsion (difference vector / squared length per vertex of the cell), scaled by the
+        # mean weight of the cell's vertices
+        repulsion = diff * (count[candidates] / squared_length - trace / squared_length**2
+                            + 4 * diff_moment_diff / squared_length**3)[..., np.newaxis]
+        repulsion -= 2 * moment_diff / squared_length[..., np.newaxis]**2
+        repulsion *= (repulsive_const*(natural_spring_length**2)*mass[candidates]
+                      / np.maximum(count[candidates], 1))[..., np.newaxis]
+
+        displacement = repulsion - attraction
+        displacement[~valid] = 0
+
+        return np.sum(displacement, axis=-2)
@@ -1,5 +1,6 @@
 
 from abc import ABC, abstractmethod
+from .profiler import Profiler
 
 
 class IModel(ABC):
@@ -10,6 +11,21 @@ class IModel(ABC):
 
     @abstractmethod
     def __init__(self):
+        # Instrumentation used by the controller and the views, disabled by default
+        self.profiler = Profiler()
+
+    def set_render_rate(self, render_rate):
+        """
+        Limits the number of view updates per second. Models that do not support it update
+        the views on every change.
+
+        :param render_rate: float
+            Maximum number of view updates per second, None to update the views on every change
+
+        :return: None
+
+        """
+
         pass
 
     @abstractmethod
@@ -40,3 +56,7 @@ class IModel(ABC):
     @abstractmethod
     def set_edge_threshold_mask(self, mask):
         raise NotImplementedError()
+
+    @abstractmethod
+    def set_visible_edges(self, indices):
+        raise NotImplementedError()
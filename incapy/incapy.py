@@ -3,6 +3,7 @@ from .graph_controller import GraphAlgorithm
 from .graph_model import GraphModel
 from .jupyter_view import JupyterView
 from .load_data import DataLoader
+from .playback import PlaybackController
 
 
 class Incapy():
@@ -12,7 +13,12 @@ class Incapy():
     """
     # Incapy class needs to control all constants, because they are only passed through here
     def __init__(self, filename, model_class=GraphModel, view_class=JupyterView, controller_class=GraphAlgorithm,
-                 data_loader_class=DataLoader, repulsive_const=1, anim_speed_const=1, time_per_window=30):
+                 data_loader_class=DataLoader, repulsive_const=1, anim_speed_const=1, time_per_window=30,
+                 condensed_weights=False, force_kernel='exact', dtype='float64', trajectory_filename=None,
+                 playback_fps=20, render_rate=30, sparse_top_k=None, sparse_cutoff=None, cooling=None,
+                 convergence_tolerance=1e-3, tick_rate=60, shared_data=True,
+                 transition_steps=0, transition_easing='linear', layout_cache_size=0, layout_cache_dir=None,
+                 profile=False):
         """
         Constructor for the Incapy class.
 
@@ -32,14 +38,66 @@ class Incapy():
             animation speed constant
         :param edge_threshold: float
             display all edges greater than the threshold
+        :param condensed_weights: bool
+            keep the weights as condensed upper triangle instead of full matrices
+        :param force_kernel: string
+            'exact', 'buffered' (exact, in preallocated buffers) or 'grid' (approximate, for many vertices)
+            calculation of the layout forces
+        :param dtype: string
+            floating point type of weights and positions, 'float32' halves memory and bandwidth
+        :param trajectory_filename: string
+            if given, the layouts are replayed from this precomputed trajectory (see compute_layouts)
+            by a PlaybackController instead of being calculated
+        :param playback_fps: float
+            frame rate of the playback of a trajectory
+        :param render_rate: float
+            maximum number of view updates per second, None to update the view on every step
+        :param sparse_top_k: int
+            if given, only the weights of the top_k strongest correlations of every vertex are kept,
+            which saves memory and time for large numbers of vertices (see incapy.sparse); steps only
+            scale with the number of kept pairs with force_kernel='grid', the 'exact' kernel still
+            calculates the forces of all pairs of vertices
+        :param sparse_cutoff: float
+            if given, only the weights of pairs whose absolute correlation is greater than the cutoff are kept
+            (as for sparse_top_k, use force_kernel='grid' for steps that scale with the kept pairs)
+        :param cooling: float
+            if given, the step size decreases by this factor per second within a window, and the animation
+            sleeps once the layout has converged, until the next window or a user event
+        :param convergence_tolerance: float
+            largest speed (in natural spring lengths per second) of a converged layout
+        :param tick_rate: float
+            target number of layout steps per second, None to step as fast as possible
+        :param shared_data: bool
+            share the loaded data (read-only) with all other sessions of the same file in this process
+        :param transition_steps: int
+            number of layout steps over which the weights are blended into those of the next window, 0 switches at once
+        :param transition_easing: string
+            how the weights are blended: 'linear', 'smoothstep' or 'cosine'
+        :param layout_cache_size: int
+            number of window layouts kept, so jumping back to (or resetting to) a window restores its layout
+        :param layout_cache_dir: string
+            directory to keep the window layouts in across sessions
+        :param profile: bool
+            measure the time spent per stage (layout step, rendering, ...), see get_profile
 
         """
 
         # Instantiate the classes, NOTE: do not change order
         self.model = model_class()
+        self.model.set_render_rate(render_rate)
+        self.model.profiler.set_enabled(profile)
         self.view = view_class(self.model, anim_speed_const=anim_speed_const, update_weight_time=time_per_window)
+        controller_args = dict(condensed_weights=condensed_weights, force_kernel=force_kernel, dtype=dtype,
+                               sparse_top_k=sparse_top_k, sparse_cutoff=sparse_cutoff, cooling=cooling,
+                               convergence_tolerance=convergence_tolerance, tick_rate=tick_rate,
+                               shared_data=shared_data, transition_steps=transition_steps,
+                               transition_easing=transition_easing, layout_cache_size=layout_cache_size,
+                               layout_cache_dir=layout_cache_dir)
+        if trajectory_filename is not None:
+            controller_class = PlaybackController
+            controller_args.update(trajectory_filename=trajectory_filename, fps=playback_fps)
         self.controller = controller_class(self.model, filename, data_loader_class, repulsive_const, anim_speed_const,
-                                           time_per_window)
+                                           time_per_window, **controller_args)
 
     def show(self, edge_threshold=0.4):
         """
@@ -55,6 +113,17 @@ class Incapy():
 
         return self.view.show()
 
+    def close(self):
+        """
+        Stops the animation and the background threads of the controller, e.g. before the session
+        is discarded. The session cannot be used afterwards.
+
+        :return: None
+
+        """
+
+        self.controller.close()
+
     def add_view(self, view):
         """
         Adds another view to the listeners.
@@ -180,6 +249,70 @@ class Incapy():
 
         self.controller.set_repeat(value)
 
+    def compute_layouts(self, filename, steps_per_window, dt=0.05, windows=None, record_every=1,
+                        warm_start='previous'):
+        """
+        Precomputes the layouts of all windows and writes the trajectory of vertex positions to 'filename'
+        (see GraphAlgorithm.compute_layouts).
+
+        :param filename: string
+            The filename of the trajectory, ending with '.h5', '.hdf5' or '.npz'
+        :param steps_per_window: int
+            The number of steps per window
+        :param dt: float
+            Time (in seconds) per step
+        :param windows: list
+            The windows to be computed, all windows by default
+        :param record_every: int
+            Every how many steps the positions are recorded
+        :param warm_start: string
+            'previous' or 'static' positions each window starts from
+
+        :return: None
+
+        """
+
+        self.controller.compute_layouts(filename, steps_per_window, dt, windows, record_every, warm_start)
+
+    def set_profiling(self, enabled):
+        """
+        Switches the measurement of the time spent per stage on or off. Switching on starts new measurements.
+
+        :param enabled: boolean
+            True to measure
+
+        :return: None
+
+        """
+
+        self.model.profiler.set_enabled(enabled)
+
+    def get_profile(self):
+        """
+        Returns the measurements: per stage ('step', 'window_switch', 'filter_edges', 'render',
+        'view_update', 'build_nodes', 'pipe_send') the number of events, durations (in seconds),
+        rate (events per second) and histogram, and the counters (dropped frames, prefetch hits and misses).
+
+        :return: dict
+            The measurements (see Profiler.stats)
+
+        """
+
+        return self.model.profiler.stats()
+
+    def export_profile(self, filename):
+        """
+        Writes the measurements (see get_profile) as JSON to 'filename'.
+
+        :param filename: string
+            The filename of the JSON file
+
+        :return: None
+
+        """
+
+        self.model.profiler.to_json(filename)
+
     # TODO: Refactor into dictionary
     def notify(self, msg, value=None):
         """
@@ -1,14 +1,45 @@
 
-import holoviews as hv
-from holoviews import opts
-from holoviews.streams import Pipe
 from .iview import IView
-from IPython.display import display
-import ipywidgets as widgets
-from ipywidgets import Layout
 
 
-hv.extension('bokeh')
+# The visualization stack (holoviews with bokeh, ipywidgets, IPython) is imported when the first
+# view is created, so headless use of the model and controller (e.g. in worker processes) does not load it
+hv = None
+opts = None
+Pipe = None
+display = None
+widgets = None
+Layout = None
+
+
+def _import_view_stack():
+    """
+    Imports the visualization stack and initializes the bokeh extension, once.
+
+    :return: None
+
+    """
+
+    global hv, opts, Pipe, display, widgets, Layout
+    if hv is not None:
+        return
+
+    import holoviews
+    from holoviews import opts as holoviews_opts
+    from holoviews.streams import Pipe as HoloviewsPipe
+    from IPython.display import display as ipython_display
+    import ipywidgets
+    from ipywidgets import Layout as WidgetLayout
+
+    holoviews.extension('bokeh')
+
+    opts = holoviews_opts
+    Pipe = HoloviewsPipe
+    display = ipython_display
+    widgets = ipywidgets
+    Layout = WidgetLayout
+    # Set last, marks the stack as imported
+    hv = holoviews
 
 
 class JupyterView(IView):
@@ -28,6 +59,8 @@ class JupyterView(IView):
 
         """
 
+        _import_view_stack()
+
         # Initialize the constructor of the abstract base class
         super().__init__(model)
 
@@ -247,6 +280,8 @@ class JupyterView(IView):
 
         """
 
+        profiler = self.model.profiler
+        start = profiler.clock()
         vertex_ids = data[1][1]
 
         # TODO see if library function in holoviews is available with option to display edges or not
@@ -263,9 +298,13 @@ class JupyterView(IView):
             vertex_ids = []
 
         nodes = hv.Nodes((pos_x, pos_y, vertex_ids))
+        profiler.record('build_nodes', start)
 
         new_data = ((edge_source, edge_target), nodes)
+        send_start = profiler.clock()
         self.pipe.send(new_data)
+        profiler.record('pipe_send', send_start)
+        profiler.record('view_update', start)
 
     def _register(self, model):
         """
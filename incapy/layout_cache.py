@@ -0,0 +1,154 @@
+import hashlib
+import os
+import threading
+from collections import OrderedDict
+import numpy as np
+from .sparse import SparseWeights
+
+
+def weights_hash(weights):
+    """
+    Returns a hash of the weights of a window.
+
+    :param weights: Numpy 2D or 1D array, or SparseWeights
+        The weights
+    :return: string
+        The hash (hexadecimal)
+
+    """
+
+    digest = hashlib.blake2b(digest_size=16)
+    if isinstance(weights, SparseWeights):
+        for array in (weights.sources, weights.targets, weights.weights, np.asarray(weights.default_weight)):
+            digest.update(np.ascontiguousarray(array).data)
+    else:
+        weights = np.ascontiguousarray(weights)
+        digest.update(str((weights.shape, weights.dtype.str)).encode())
+        digest.update(weights.data)
+    return digest.hexdigest()
+
+
+def layout_key(window, weights_digest, constants):
+    """
+    Returns the key of the layout of a window.
+
+    :param window: int
+        The window
+    :param weights_digest: string
+        The hash of the weights of the window (see weights_hash)
+    :param constants: tuple
+        The constants of the layout (e.g. repulsive constant, natural spring length)
+    :return: string
+        The key
+
+    """
+
+    digest = hashlib.blake2b(repr((window, weights_digest, constants)).encode(), digest_size=16)
+    return '{}-{}'.format(window, digest.hexdigest())
+
+
+class LayoutCache:
+    """
+    Cache of the laid out vertex positions of windows, so a window that is shown again starts
+    from its previous layout instead of from the static positions. Entries are keyed by the window,
+    a hash of its weights and the constants of the layout, so a changed recording or changed
+    constants never restore a wrong layout. The least recently used entries are evicted; if a
+    directory is given, all entries are also kept there as .npy files and survive the session.
+
+    """
+
+    def __init__(self, capacity=64, directory=None):
+        """
+        Constructor for the LayoutCache class.
+
+        :param capacity: int
+            The number of layouts kept in memory
+        :param directory: string
+            If given, layouts are also stored in (and read from) this directory
+
+        """
+
+        self.capacity = capacity
+        self.directory = directory
+        if directory is not None:
+            os.makedirs(directory, exist_ok=True)
+
+        self.layouts = OrderedDict()
+        # Layouts are stored by the animation thread and restored from the ui
+        self.lock = threading.Lock()
+
+    def _path(self, key):
+        return os.path.join(self.directory, key + '.npy')
+
+    def get(self, key):
+        """
+        Returns a layout.
+
+        :param key: string
+            The key of the layout (see layout_key)
+        :return: Numpy 2D array, shape (X, 2)
+            A copy of the positions, None if not cached
+
+        """
+
+        with self.lock:
+            positions = self.layouts.get(key)
+            if positions is not None:
+                self.layouts.move_to_end(key)
+                return positions.copy()
+
+        if self.directory is None or not os.path.exists(self._path(key)):
+            return None
+        positions = np.load(self._path(key))
+        self._insert(key, positions)
+        return positions.copy()
+
+    def put(self, key, positions):
+        """
+        Stores a layout.
+
+        :param key: string
+            The key of the layout (see layout_key)
+        :param positions: Numpy 2D array, shape (X, 2)
+            The positions of the vertices, copied
+
+        :return: None
+
+        """
+
+        positions = np.array(positions)
+        self._insert(key, positions)
+
+        if self.directory is not None:
+            # Written to a temporary file first, so a concurrent reader never sees a partial file
+            temporary = self._path(key) + '.tmp.npy'
+            np.save(temporary, positions)
+            os.replace(temporary, self._path(key))
+
+    def _insert(self, key, positions):
+        """
+        Adds a layout to the layouts in memory, evicts the least recently used.
+
+        :return: None
+
+        """
+
+        with self.lock:
+            self.layouts[key] = positions
+            self.layouts.move_to_end(key)
+            while len(self.layouts) > self.capacity:
+                self.layouts.popitem(last=False)
+
+    def __len__(self):
+        return len(self.layouts)
+
+    def clear(self):
+        """
+        Removes all layouts from memory (not from the directory).
+
+        :return: None
+
+        """
+
+        with self.lock:
+            self.layouts.clear()
@@ -1,7 +1,13 @@
 
 
+import os
+import threading
+import weakref
+from collections import OrderedDict
 import numpy as np
 import h5py as h5
+from .condensed import condensed_to_square, diagonal_positions
+from .sparse import SparseWeights, strongest_pairs
 
 
 class DataLoader:
@@ -10,12 +16,38 @@ class DataLoader:
 
     """
 
-    def __init__(self):
+    # Whether the loaded data can be shared by all sessions of the same file (see load_shared)
+    shareable = True
+
+    def __init__(self, condensed=False, dtype='float64', top_k=None, cutoff=None):
         """
         Constructor for class DataLoader. Sets all the attributes to None.
 
+        :param condensed: bool
+            If 'True', the weights of each window are kept as condensed upper triangle
+            (see incapy.condensed) instead of a full matrix
+        :param dtype: string or numpy dtype
+            Floating point type of the weights
+        :param top_k: int
+            If given, the weights are sparse (see incapy.sparse) and keep the pairs of the
+            top_k strongest correlations of every vertex
+        :param cutoff: float
+            If given, the weights are sparse and keep the pairs whose absolute correlation
+            is greater than the cutoff
+
         """
 
+        # Whether weights are stored condensed, dense matrices are only built on request
+        self.condensed = condensed
+
+        # Selection of the pairs kept by sparse weights, None for all pairs
+        self.top_k = top_k
+        self.cutoff = cutoff
+        self.sparse = top_k is not None or cutoff is not None
+
+        # Floating point type of the weights
+        self.dtype = np.dtype(dtype)
+
         # The correlation between two vertices (only needed for loading the data, then saved in 'self.weights'
         self.x_corr = None
 
@@ -31,7 +63,8 @@ class DataLoader:
         # Defines start and stop timestamp for each set of cross-correlations
         self.frame_durations = None
 
-        # Weights is an upper triangular matrix consisting of the weights between the vertices
+        # Weights is a symmetric matrix (or its condensed upper triangle) per window
+        # consisting of the weights between the vertices
         self.weights = None
 
         # An integer consisting of the number of windows
@@ -84,32 +117,413 @@ class DataLoader:
         # TODO: Check when missing an index!!!
         # NEED INDICES BEFORE AND EDGES
         num_vert = len(self.vertex_ids)
-        self.weights = np.zeros((self.x_corr.shape[0]-1, num_vert, num_vert), dtype='float64')
-        upper = np.triu_indices(num_vert)
 
-        # The number of windows
-        self.number_windows = 12
+        # The number of windows (first row of x_corr holds the edge indices)
+        self.number_windows = self.x_corr.shape[0] - 1
+
+        # Weights of all windows, built at once
+        self.weights = self.calculate_weights(self.x_corr[1:], num_vert)
+
+        # Vertex Attributes
+        self.positions = np.array(file['staticData/vertexAttributes/position'])
+
+    def calculate_weights(self, x_corr, num_vert):
+        """
+        Calculates the weights of all windows at once from the condensed cross-correlations.
+
+        :param x_corr: Numpy array, shape (..., num_vert*(num_vert+1)/2)
+            The upper triangular cross-correlations of every window (or of a single window)
+        :param num_vert: int
+            The number of vertices
+        :return: Numpy array, shape (..., num_vert, num_vert) or (..., num_vert*(num_vert+1)/2)
+            The symmetric weight matrices, or their condensed values if 'self.condensed' is set
+            (SparseWeights, or a list of them, if 'self.sparse' is set)
 
-        # TODO: Optimize using numpy, could remove for loop
-        for timestamp in range(self.x_corr.shape[0]-1):
+        """
 
-            # Set weights into upper triangular matrix
-            self.weights[timestamp][upper] = self.x_corr[1:][timestamp]
-            self.weights[timestamp] += self.weights[timestamp].T
+        if self.sparse:
+            return self.calculate_sparse_weights(x_corr, num_vert)
 
-            # Numpy magic to subtract added values on diagonal; should not make a difference
-            # Because diagonal represents correlation from electrode n to n
-            self.weights[timestamp] -= np.diag(np.diag(self.weights[timestamp]))
+        # Actually calculate graph weights from xcorr, currently this is 1-xcorr
+        # Done on the condensed values, before they are expanded into matrices
+        # Windows need to be contiguous in memory, x_corr is usually a transposed view of the file data
+        condensed_weights, _ = self.x_corr_to_weight(np.ascontiguousarray(x_corr, dtype=self.dtype))
 
-            # Actually calculate graph weights from xcorr
-            # Currently this is 1-xcorr
-            self.weights[timestamp], _ = self.x_corr_to_weight(self.weights[timestamp])
+        # Diagonal represents correlation from electrode n to n, should not make a difference
+        # Weight on the diagonal as it results from a correlation of 0
+        diagonal_weight, _ = self.x_corr_to_weight(np.zeros(1, dtype=self.dtype))
+        condensed_weights[..., diagonal_positions(num_vert)] = diagonal_weight[0]
 
-        # Vertex Attributes
-        self.positions = np.array(file['staticData/vertexAttributes/position'])
+        if self.condensed:
+            return condensed_weights
+        return condensed_to_square(condensed_weights, num_vert)
+
+    def calculate_sparse_weights(self, x_corr, num_vert):
+        """
+        Calculates the sparse weights of all windows from the condensed cross-correlations.
+
+        :param x_corr: Numpy array, shape (..., num_vert*(num_vert+1)/2)
+            The upper triangular cross-correlations of every window (or of a single window)
+        :param num_vert: int
+            The number of vertices
+        :return: SparseWeights or list
+            The sparse weights of the window, or a list of the sparse weights of every window
+
+        """
+
+        x_corr = np.asarray(x_corr, dtype=self.dtype)
+        if x_corr.ndim > 1:
+            return [self.calculate_sparse_weights(window, num_vert) for window in x_corr]
+
+        sources, targets, index = strongest_pairs(x_corr, num_vert, self.top_k, self.cutoff)
+        weights, _ = self.x_corr_to_weight(x_corr[index])
+        # Pairs that are not kept are treated as uncorrelated
+        default_weight, _ = self.x_corr_to_weight(np.zeros(1, dtype=self.dtype))
+        return SparseWeights(sources, targets, weights, num_vert, default_weight[0])
+
+    def dense_weights(self, window):
+        """
+        Returns the weight matrix of a window, expanding it if weights are stored condensed.
+
+        :param window: int
+            The window
+        :return: Numpy 2D array
+            The symmetric weight matrix
+
+        """
+
+        if self.sparse:
+            return self.weights[window].to_dense()
+        if self.condensed:
+            return condensed_to_square(self.weights[window], len(self.vertex_ids))
+        return self.weights[window]
 
     def x_corr_to_weight(self, x_corr):
         # weight = 1-x_corr
         weight = x_corr*(-1)+1
         inverse_sign = True
         return weight, inverse_sign
+
+
+class LazyDataLoader(DataLoader):
+    """
+    Class to load the data lazily from the (hdf5) file. The file is kept open and
+    the cross-correlations and weights of a window are only read and built when
+    that window is requested. The most recently used windows are cached.
+    Reading a window is fastest from files converted by incapy.convert.
+
+    """
+
+    def __init__(self, condensed=False, dtype='float64', top_k=None, cutoff=None, cache_size=4):
+        """
+        Constructor for class LazyDataLoader.
+
+        :param condensed: bool
+            If 'True', the weights of each window are kept as condensed upper triangle
+        :param dtype: string or numpy dtype
+            Floating point type of the weights
+        :param top_k: int
+            If given, sparse weights keep the top_k strongest correlations of every vertex
+        :param cutoff: float
+            If given, sparse weights keep the pairs whose absolute correlation is greater than the cutoff
+        :param cache_size: int
+            The number of windows kept in memory
+
+        """
+
+        super().__init__(condensed, dtype, top_k, cutoff)
+
+        # The number of windows kept in memory
+        self.cache_size = cache_size
+
+        # The open hdf5 file and its cross-correlations
+        self.file = None
+        self.x_corr_dataset = None
+
+    def load_graph_topology_time_variant(self, filename):
+        """
+        Opens the hdf5 file and loads everything but the time variant data, which
+        is read window by window when it is needed.
+
+        :param filename: string
+            The filename for the hdf5 file with the data
+        :return: None
+
+        """
+
+        # The filename, reading mode only; stays open for later window reads
+        self.file = h5.File(filename, 'r')
+
+        self.vertex_ids = np.array(self.file['vertexIDs'])
+        self.edge_ids = np.array(self.file['edgeIDs'])
+        self.frame_durations = np.array(self.file['timeVariantData/frameDuration'])
+        self.positions = np.array(self.file['staticData/vertexAttributes/position'])
+
+        # Edge Attributes (time variant), one column per window (first column holds the edge indices)
+        # In files converted by incapy.convert every column is a chunk of its own, so a window is a single read
+        dataset = self.file['timeVariantData/edgeAttributes/CrossCorrelations']
+        num_vert = len(self.vertex_ids)
+
+        # Converted files record the size of the data
+        if self.file.attrs.get('numVertices', num_vert) != num_vert \
+                or self.file.attrs.get('numWindows', dataset.shape[1] - 1) != dataset.shape[1] - 1:
+            raise ValueError("Size of the data does not match the attributes 'numVertices' and 'numWindows'")
+
+        # Indexed like the transposed dataset, i.e. x_corr[window + 1] are the correlations of a window
+        self.x_corr_dataset = dataset
+        self.x_corr = LazyWindows(lambda index: dataset[:, index], dataset.shape[1], self.cache_size)
+
+        self.weights = LazyWindows(lambda window: self.calculate_weights(self.x_corr[window + 1], num_vert),
+                                   dataset.shape[1] - 1, self.cache_size)
+
+        self.number_windows = len(self.weights)
+
+    def close(self):
+        """
+        Closes the hdf5 file.
+
+        :return: None
+
+        """
+
+        if self.file is not None:
+            self.file.close()
+            self.file = None
+            self.x_corr_dataset = None
+
+
+class MemmapDataLoader(DataLoader):
+    """
+    Class to load the data from a directory of numpy files (see 'save_memmap'), which are
+    memory-mapped instead of read. Processes loading the same directory share the data
+    in memory. The weights of a window are built when the window is requested.
+
+    """
+
+    # The arrays stored in the directory, one '.npy' file each
+    arrays = ('vertexIDs', 'edgeIDs', 'frameDuration', 'CrossCorrelations', 'position')
+
+    def __init__(self, condensed=False, dtype='float64', top_k=None, cutoff=None, cache_size=2):
+        """
+        Constructor for class MemmapDataLoader.
+
+        :param condensed: bool
+            If 'True', the weights of each window are kept as condensed upper triangle
+        :param dtype: string or numpy dtype
+            Floating point type of the weights
+        :param top_k: int
+            If given, sparse weights keep the top_k strongest correlations of every vertex
+        :param cutoff: float
+            If given, sparse weights keep the pairs whose absolute correlation is greater than the cutoff
+        :param cache_size: int
+            The number of windows kept in memory
+
+        """
+
+        super().__init__(condensed, dtype, top_k, cutoff)
+        self.cache_size = cache_size
+
+    def load_graph_topology_time_variant(self, directory):
+        """
+        Memory-maps the data saved by 'save_memmap'.
+
+        :param directory: string
+            The directory with the numpy files
+        :return: None
+
+        """
+
+        data = {name: np.load(os.path.join(directory, name + '.npy'), mmap_mode='r') for name in self.arrays}
+
+        self.vertex_ids = data['vertexIDs']
+        self.edge_ids = data['edgeIDs']
+        self.frame_durations = data['frameDuration']
+        self.positions = data['position']
+        # Same layout as for DataLoader, i.e. x_corr[window + 1] are the correlations of a window
+        self.x_corr = data['CrossCorrelations']
+
+        num_vert = len(self.vertex_ids)
+        self.weights = LazyWindows(lambda window: self.calculate_weights(self.x_corr[window + 1], num_vert),
+                                   self.x_corr.shape[0] - 1, self.cache_size)
+        self.number_windows = len(self.weights)
+
+
+# Loaders shared by the sessions of a process, kept as long as a session uses them
+_shared_loaders = weakref.WeakValueDictionary()
+_shared_loaders_lock = threading.Lock()
+
+
+def load_shared(dataloader, filename, **options):
+    """
+    Returns a loader that has loaded the data of a file, shared with all other sessions of this
+    process that load the same file (unchanged since, by its modification time) with the same
+    loader class and options. The data is only loaded once and kept in memory once; its arrays
+    are made read-only, so no session can change the data of the others.
+
+    :param dataloader: class
+        The dataloader class
+    :param filename: string
+        The filename for the data to be loaded
+    :param options:
+        Keyword arguments of the dataloader class (e.g. condensed, dtype)
+    :return: DataLoader
+        The loader with the loaded data
+
+    """
+
+    # Data that is not a file on disk (e.g. streams) is loaded for each session
+    if not dataloader.shareable or not isinstance(filename, (str, os.PathLike)) or not os.path.exists(filename):
+        loader = dataloader(**options)
+        loader.load_data(filename)
+        return loader
+
+    key = (dataloader, os.path.realpath(filename), os.stat(filename).st_mtime_ns,
+           tuple(sorted((name, str(value)) for name, value in options.items())))
+    # Sessions are created from different threads, the data is loaded only once
+    with _shared_loaders_lock:
+        loader = _shared_loaders.get(key)
+        if loader is None:
+            loader = dataloader(**options)
+            loader.load_data(filename)
+            make_read_only(loader)
+            _shared_loaders[key] = loader
+        return loader
+
+
+def make_read_only(loader):
+    """
+    Makes the arrays of a loader read-only, including those of windows that are loaded later.
+
+    :param loader: DataLoader
+        A loader that has loaded the data
+
+    :return: None
+
+    """
+
+    for name in ('x_corr', 'weights', 'positions', 'vertex_ids', 'edge_ids', 'frame_durations'):
+        value = getattr(loader, name)
+        if isinstance(value, np.ndarray):
+            value.setflags(write=False)
+        elif isinstance(value, LazyWindows):
+            value.read_only = True
+
+
+def save_memmap(loader, directory, windows=None, max_memory=2**28):
+    """
+    Saves the data of a loader to a directory, so it can be memory-mapped by MemmapDataLoader.
+    Only the cross-correlations of the given windows are copied; window i of the saved data is
+    windows[i]. Lazy loaders are read in blocks of columns of the hdf5 dataset (as by incapy.convert),
+    not window by window, which would read every row of the dataset once per window.
+
+    :param loader: DataLoader
+        A loader that has loaded the data
+    :param directory: string
+        The directory the numpy files are written to
+    :param windows: list
+        The windows to be saved, all windows by default
+    :param max_memory: int
+        Maximum size (in bytes) of the columns read at once from an hdf5 dataset
+
+    :return: None
+
+    """
+
+    for name, array in (('vertexIDs', loader.vertex_ids), ('edgeIDs', loader.edge_ids),
+                        ('frameDuration', loader.frame_durations), ('position', loader.positions)):
+        np.save(os.path.join(directory, name + '.npy'), array)
+
+    if windows is None:
+        windows = range(loader.number_windows)
+    # The first column holds the edge indices, all others a window each
+    columns = np.array([0] + [window + 1 for window in windows], dtype=np.int64)
+
+    first = np.asarray(loader.x_corr[0])
+    x_corr = np.lib.format.open_memmap(os.path.join(directory, 'CrossCorrelations.npy'), mode='w+',
+                                       dtype=first.dtype, shape=(len(columns),) + first.shape)
+
+    dataset = getattr(loader, 'x_corr_dataset', None)
+    if dataset is None:
+        # In memory (or memory-mapped), a window is a row
+        for row, column in enumerate(columns):
+            x_corr[row] = loader.x_corr[column]
+    else:
+        # Rows of the dataset are edges, a window is a column; the requested columns are read in
+        # ascending order, all those within a block of columns with a single read
+        group_size = max(1, max_memory // (dataset.shape[0] * dataset.dtype.itemsize))
+        rows = np.argsort(columns, kind='stable')
+        start = 0
+        while start < len(rows):
+            first_column = columns[rows[start]]
+            end = start + 1
+            while end < len(rows) and columns[rows[end]] < first_column + group_size:
+                end += 1
+            block = np.asarray(dataset[:, first_column:columns[rows[end - 1]] + 1])
+            x_corr[rows[start:end]] = block[:, columns[rows[start:end]] - first_column].T
+            start = end
+    x_corr.flush()
+
+
+class LazyWindows:
+    """
+    Sequence of windows that are loaded on first access and kept in a
+    least recently used cache.
+
+    """
+
+    def __init__(self, load_window, length, cache_size):
+        """
+        Constructor for class LazyWindows.
+
+        :param load_window: function
+            Called with the index of a window, returns its data
+        :param length: int
+            The number of windows
+        :param cache_size: int
+            The number of windows kept in memory
+
+        """
+
+        self.load_window = load_window
+        self.length = length
+        self.cache_size = cache_size
+        # If set, the arrays of loaded windows are made read-only
+        self.read_only = False
+
+        # Index of window -> data, ordered from least to most recently used
+        self.cache = OrderedDict()
+        # Windows are requested from the animation thread as well as from the ui
+        self.lock = threading.Lock()
+
+    def __len__(self):
+        return self.length
+
+    def __getitem__(self, index):
+        """
+        Returns the data of window 'index', loading it if it is not cached.
+
+        :param index: int
+            The index of the window, negative values count from the end
+        :return: Numpy array
+            The data of the window
+
+        """
+
+        if index < 0:
+            index += self.length
+        if not 0 <= index < self.length:
+            raise IndexError("window index out of range")
+
+        with self.lock:
+            if index in self.cache:
+                self.cache.move_to_end(index)
+                return self.cache[index]
+
+            data = self.load_window(index)
+            if self.read_only and isinstance(data, np.ndarray):
+                data.setflags(write=False)
+            self.cache[index] = data
+            # Evict the least recently used windows
+            while len(self.cache) > self.cache_size:
+                self.cache.popitem(last=False)
+            return data
@@ -0,0 +1,143 @@
+import os
+import shutil
+import tempfile
+import multiprocessing
+import numpy as np
+from .graph_controller import GraphAlgorithm
+from .graph_model import GraphModel
+from .load_data import LazyDataLoader, MemmapDataLoader, save_memmap
+from .trajectory import TrajectoryWriter
+
+
+# Controller of a worker process, created once per process by _init_worker
+_worker_controller = None
+
+
+def _init_worker(directory, repulsive_const, anim_speed_const, condensed_weights, force_kernel, dtype):
+    """
+    Creates the controller of a worker process on the memory-mapped data.
+
+    :return: None
+
+    """
+
+    global _worker_controller
+    _worker_controller = GraphAlgorithm(GraphModel(), directory, MemmapDataLoader, repulsive_const, anim_speed_const,
+                                        0, condensed_weights=condensed_weights, force_kernel=force_kernel,
+                                        dtype=dtype)
+    _worker_controller.init_algorithm()
+
+
+def _layout_window(task):
+    """
+    Computes the layout of one window, starting from the static positions, and writes the
+    recorded positions into the memory-mapped output.
+
+    :param task: tuple
+        Index in the output, window (in the memory-mapped data), steps, dt, record_every and
+        filename of the output
+    :return: tuple
+        The index in the output and the natural spring length of the layout
+
+    """
+
+    index, window, steps, dt, record_every, output_filename = task
+    frames = _worker_controller.layout_window(window, steps, dt, record_every, warm_start='static')
+
+    output = np.load(output_filename, mmap_mode='r+')
+    output[index] = frames
+    output.flush()
+    return index, _worker_controller.natural_spring_length
+
+
+def compute_layouts_parallel(filename, trajectory_filename, steps_per_window, dt=0.05, windows=None,
+                             record_every=1, processes=None, repulsive_const=1, anim_speed_const=1,
+                             condensed_weights=True, force_kernel='exact', dtype='float64', temp_dir=None):
+    """
+    Computes the layouts of independent windows in parallel on a pool of processes. Every window
+    starts from the static positions of the data (as GraphAlgorithm.compute_layouts with
+    warm_start='static'), so the results are the same as computed by a single process.
+
+    The data is not pickled to the processes: the cross-correlations of the windows are written
+    once to a temporary directory and memory-mapped by all processes (see MemmapDataLoader). The
+    processes also write their positions into a memory-mapped array, which is gathered
+    into a single trajectory.
+
+    :param filename: string
+        The filename for the hdf5 file with the data
+    :param trajectory_filename: string
+        The filename of the trajectory, ending with '.h5', '.hdf5' or '.npz'
+    :param steps_per_window: int
+        The number of steps per window
+    :param dt: float
+        Time (in seconds) per step
+    :param windows: list
+        The windows to be computed, all windows by default
+    :param record_every: int
+        Every how many steps the positions are recorded
+    :param processes: int
+        The number of processes, the number of cores by default
+    :param repulsive_const: float
+        repulsive constant
+    :param anim_speed_const: float
+        animation speed constant
+    :param condensed_weights: bool
+        keep the weights as condensed upper triangle instead of full matrices
+    :param force_kernel: string
+        'exact', 'buffered' or 'grid' calculation of the layout forces
+    :param dtype: string
+        floating point type of weights and positions
+    :param temp_dir: string
+        Where the temporary directory is created (e.g. '/dev/shm'), system default if None
+
+    :return: None
+
+    """
+
+    directory = tempfile.mkdtemp(prefix='incapy_', dir=temp_dir)
+    try:
+        # Only the cross-correlations of the computed windows are needed
+        loader = LazyDataLoader(cache_size=1)
+        loader.load_data(filename)
+        if windows is None:
+            windows = range(loader.number_windows)
+        windows = list(windows)
+        # Window i of the memory-mapped data is windows[i]
+        save_memmap(loader, directory, windows)
+        loader.close()
+        num_frames = steps_per_window // record_every
+
+        output_filename = os.path.join(directory, 'positions.npy')
+        output = np.lib.format.open_memmap(output_filename, mode='w+', dtype=dtype,
+                                           shape=(len(windows), num_frames, len(loader.vertex_ids), 2))
+        del output
+
+        # Spring length is the same in all workers, it only depends on the static positions
+        controller = GraphAlgorithm(GraphModel(), directory, MemmapDataLoader, repulsive_const, anim_speed_const, 0,
+                                    condensed_weights=condensed_weights, force_kernel=force_kernel, dtype=dtype,
+                                    shared_data=False)
+        controller.init_algorithm()
+        natural_spring_length = controller.natural_spring_length
+        controller.close()
+        del controller
+
+        tasks = [(index, index, steps_per_window, dt, record_every, output_filename)
+                 for index in range(len(windows))]
+        if tasks:
+            with multiprocessing.Pool(processes, initializer=_init_worker,
+                                      initargs=(directory, repulsive_const, anim_speed_const, condensed_weights,
+                                                force_kernel, dtype)) as pool:
+                for _ in pool.imap_unordered(_layout_window, tasks):
+                    pass
+
+        positions = np.load(output_filename, mmap_mode='r')
+        with TrajectoryWriter(trajectory_filename, windows, num_frames, loader.vertex_ids, dtype,
+                              steps_per_window=steps_per_window, dt=dt, record_every=record_every,
+                              warm_start='static', anim_speed_const=anim_speed_const,
+                              repulsive_const=repulsive_const, force_kernel=force_kernel,
+                              natural_spring_length=natural_spring_length) as writer:
+            for index in range(len(windows)):
+                writer.write(index, positions[index])
+        del positions
+    finally:
+        shutil.rmtree(directory, ignore_errors=True)
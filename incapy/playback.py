@@ -0,0 +1,132 @@
+import time
+from .graph_controller import GraphAlgorithm
+from .trajectory import TrajectoryReader
+
+
+class PlaybackController(GraphAlgorithm):
+    """
+
+    Controller that replays precomputed layouts (see GraphAlgorithm.compute_layouts) instead of
+    calculating them. Frames are read from the memory-mapped trajectory and sent to the model at a
+    fixed frame rate; changing the window only reads its first frame, no layout is calculated.
+
+    """
+
+    def __init__(self, model, filename, dataloader, repulsive_const, anim_speed_const, update_weight_time,
+                 trajectory_filename=None, fps=20, **kwargs):
+        """
+        Constructor for the PlaybackController class.
+
+        :param trajectory_filename: string
+            The filename of the precomputed trajectory
+        :param fps: float
+            The frame rate of the playback
+
+        For all other parameters see GraphAlgorithm.
+
+        """
+
+        # Needed by next_window, which is already called by the constructor of GraphAlgorithm
+        self.trajectory = TrajectoryReader(trajectory_filename)
+        self.frame = 0
+        self.fps = fps
+
+        super().__init__(model, filename, dataloader, repulsive_const, anim_speed_const, update_weight_time, **kwargs)
+
+    def next_window(self, value=None, restore_layout=True):
+        """
+        Updates the weights and edges to the window and shows its first precomputed frame.
+
+        :param: value
+            The window to be loaded
+        :param restore_layout: bool
+            See GraphAlgorithm.next_window
+
+        :return: None
+
+        """
+
+        # The window is shown already, it keeps its current frame
+        if value == self.current_window:
+            return
+        super().next_window(value, restore_layout)
+        with self.mutex:
+            self.frame = 0
+            self.show_frame()
+
+    def show_frame(self):
+        """
+        Sends the current frame of the current window to the model.
+
+        :return: None
+
+        """
+
+        if self.trajectory.has_window(self.current_window):
+            self.model.set_vertex_pos(self.trajectory.frame(self.current_window, self.frame))
+
+    def close(self):
+        """
+        Stops the playback and closes the trajectory.
+
+        :return: None
+
+        """
+
+        super().close()
+        self.trajectory.close()
+
+    def init_algorithm(self):
+        """
+        Nothing needs to be calculated for playback.
+
+        :return: None
+
+        """
+
+        pass
+
+    def do_step(self):
+        """
+        Moves on to the next frame of the current window; stays at its last frame.
+
+        :return: None
+
+        """
+
+        if self.frame + 1 < self.trajectory.num_frames:
+            self.frame += 1
+            self.show_frame()
+
+    def run_iteration(self):
+        """
+        Plays the frames at the frame rate. After the last frame of a window, the next window
+        is loaded once update_weight_time is reached.
+
+        :return: None
+
+        """
+
+        self.next_window(0)
+        next_frame_time = time.time()
+
+        while True:
+            # Wait for other events
+            self.wait_event.wait()
+            if self.stop:
+                break
+
+            # Sleep until the next frame is due, without accumulating delays
+            self.wake_event.clear()
+            next_frame_time = max(next_frame_time + 1 / self.fps, time.time())
+            self.sleep_until(next_frame_time)
+            if self.stop:
+                break
+
+            with self.mutex:
+                last_frame = self.frame + 1 >= self.trajectory.num_frames
+                self.do_step()
+
+            window_time = time.time() - self.current_window_time
+            if last_frame and self.update_weight_time != 0 and window_time > self.update_weight_time:
+                self.next_window()
@@ -0,0 +1,87 @@
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+
+class WindowPrefetcher:
+    """
+    Loads the data of the next window on a worker thread while the current window is animated,
+    so switching windows does not wait for the loader.
+
+    """
+
+    def __init__(self, load_window):
+        """
+        Constructor for the WindowPrefetcher class.
+
+        :param load_window: function
+            Called with the index of a window, returns its data (may raise IndexError)
+
+        """
+
+        self.load_window = load_window
+        self.executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix='incapy-prefetch')
+
+        # The window being prefetched and its future
+        self.index = None
+        self.future = None
+        # Windows are requested from the animation thread as well as from the ui
+        self.lock = threading.Lock()
+
+        # Requested windows that were already loaded (hits) or not (misses, including windows still loading)
+        self.hits = 0
+        self.misses = 0
+
+    def prefetch(self, index):
+        """
+        Starts loading a window in the background. Replaces the window prefetched before.
+
+        :param index: int
+            The index of the window
+
+        :return: None
+
+        """
+
+        with self.lock:
+            if self.index == index:
+                return
+            if self.future is not None:
+                self.future.cancel()
+            self.index = index
+            self.future = self.executor.submit(self.load_window, index)
+
+    def get(self, index):
+        """
+        Returns the data of a window, from the prefetched data if available.
+
+        :param index: int
+            The index of the window
+        :return:
+            The data of the window as returned by load_window
+
+        """
+
+        with self.lock:
+            future = self.future if self.index == index else None
+            if future is not None and future.done() and future.exception() is None:
+                self.hits += 1
+            else:
+                self.misses += 1
+            if future is not None:
+                self.index = None
+                self.future = None
+
+        if future is None:
+            return self.load_window(index)
+        # Waits if the window is still loading
+        return future.result()
+
+    def close(self):
+        """
+        Stops the worker thread.
+
+        :return: None
+
+        """
+
+        self.executor.shutdown(wait=False, cancel_futures=True)
@@ -0,0 +1,260 @@
+import bisect
+import json
+import threading
+import time
+from collections import deque
+
+
+# Upper edges (in seconds) of the buckets of the timing histograms, 4 per decade from 1us to 10s
+BUCKET_EDGES = [10**(exponent / 4) for exponent in range(-24, 5)]
+
+
+class StageTimes:
+    """
+    Timing histogram and rate of one stage (e.g. the layout step or the update of a view).
+
+    """
+
+    def __init__(self, rate_events):
+        """
+        Constructor for the StageTimes class.
+
+        :param rate_events: int
+            The number of most recent events the rate is calculated from
+
+        """
+
+        self.count = 0
+        self.total = 0.0
+        self.minimum = float('inf')
+        self.maximum = 0.0
+        # The last bucket holds everything above the last edge
+        self.buckets = [0] * (len(BUCKET_EDGES) + 1)
+        # End times of the most recent events
+        self.times = deque(maxlen=rate_events)
+
+    def add(self, end, duration):
+        """
+        Adds an event.
+
+        :param end: float
+            The time the event ended
+        :param duration: float
+            The duration (in seconds)
+
+        :return: None
+
+        """
+
+        self.count += 1
+        self.total += duration
+        self.minimum = min(self.minimum, duration)
+        self.maximum = max(self.maximum, duration)
+        self.buckets[bisect.bisect_left(BUCKET_EDGES, duration)] += 1
+        self.times.append(end)
+
+    def percentile(self, fraction):
+        """
+        Estimates a percentile of the durations from the histogram (upper edge of its bucket).
+
+        :param fraction: float
+            The percentile as fraction, e.g. 0.99
+        :return: float
+            The duration (in seconds)
+
+        """
+
+        rank = fraction * self.count
+        cumulative = 0
+        for index, count in enumerate(self.buckets):
+            cumulative += count
+            if count and cumulative >= rank:
+                upper = BUCKET_EDGES[index] if index < len(BUCKET_EDGES) else self.maximum
+                return min(upper, self.maximum)
+        return self.maximum
+
+    def rate(self, now, since, window):
+        """
+        Returns the number of events per second within the last 'window' seconds.
+
+        :return: float
+
+        """
+
+        span = min(window, now - since)
+        if span <= 0:
+            return 0.0
+        return sum(1 for end in self.times if end >= now - window) / span
+
+    def summary(self, now, since, window):
+        """
+        Returns the statistics of the stage, durations in seconds.
+
+        :return: dict
+
+        """
+
+        return {
+            'count': self.count,
+            'total': self.total,
+            'mean': self.total / self.count if self.count else 0.0,
+            'min': self.minimum if self.count else 0.0,
+            'max': self.maximum,
+            'p50': self.percentile(0.5),
+            'p90': self.percentile(0.9),
+            'p99': self.percentile(0.99),
+            'rate': self.rate(now, since, window),
+            'histogram': self.buckets,
+        }
+
+
+class Profiler:
+    """
+    Low overhead instrumentation of the hot paths: timing histograms per stage (e.g. 'step',
+    'render', 'view_update', 'window_switch'), their rates and counters (e.g. dropped frames).
+    Disabled by default; then measuring costs a method call and a comparison only.
+
+    Usage at a measured stage:
+
+        start = profiler.clock()
+        ...
+        profiler.record('step', start)
+
+    """
+
+    def __init__(self, enabled=False, rate_window=5.0, rate_events=1024):
+        """
+        Constructor for the Profiler class.
+
+        :param enabled: bool
+            If 'True', stages are measured
+        :param rate_window: float
+            Rates are calculated from the events of the last 'rate_window' seconds
+        :param rate_events: int
+            Maximum number of events per stage kept for the rates
+
+        """
+
+        self.enabled = enabled
+        self.rate_window = rate_window
+        self.rate_events = rate_events
+        # Functions returning the current values of counters, e.g. the number of dropped frames
+        self.counters = {}
+        # Stages are measured from the animation, the render and the ui threads
+        self.lock = threading.Lock()
+        self.reset()
+
+    def reset(self):
+        """
+        Removes all measurements.
+
+        :return: None
+
+        """
+
+        with self.lock:
+            self.stages = {}
+            self.start_time = time.perf_counter()
+
+    def set_enabled(self, enabled):
+        """
+        Switches measuring on or off. Switching on starts new measurements, switching off keeps them.
+
+        :param enabled: bool
+
+        :return: None
+
+        """
+
+        if enabled and not self.enabled:
+            # Rates only count the time measured
+            self.reset()
+        self.enabled = enabled
+
+    def clock(self):
+        """
+        Returns the start time of a measurement.
+
+        :return: float
+            The current time, None if disabled
+
+        """
+
+        return time.perf_counter() if self.enabled else None
+
+    def record(self, stage, start):
+        """
+        Records the duration of a stage, from its start until now.
+
+        :param stage: string
+            The name of the stage
+        :param start: float
+            The start time as returned by clock
+
+        :return: None
+
+        """
+
+        if start is None:
+            return
+        end = time.perf_counter()
+        with self.lock:
+            times = self.stages.get(stage)
+            if times is None:
+                times = self.stages[stage] = StageTimes(self.rate_events)
+            times.add(end, end - start)
+
+    def add_counter(self, name, function):
+        """
+        Adds a counter to the statistics.
+
+        :param name: string
+            The name of the counter
+        :param function: function
+            Returns the current value of the counter
+
+        :return: None
+
+        """
+
+        self.counters[name] = function
+
+    def stats(self):
+        """
+        Returns all statistics: per stage the number of events, durations (mean, min, max and
+        percentiles, in seconds), rate (events per second) and histogram, and the counters.
+
+        :return: dict
+
+        """
+
+        now = time.perf_counter()
+        with self.lock:
+            stages = {name: times.summary(now, self.start_time, self.rate_window)
+                      for name, times in self.stages.items()}
+            duration = now - self.start_time
+        return {
+            'enabled': self.enabled,
+            'duration': duration,
+            'histogram_edges': BUCKET_EDGES,
+            'stages': stages,
+            'counters': {name: function() for name, function in self.counters.items()},
+        }
+
+    def to_json(self, filename=None):
+        """
+        Exports all statistics (see stats) as JSON.
+
+        :param filename: string
+            If given, the JSON is written to this file
+
+        :return: string
+            The JSON
+
+        """
+
+        text = json.dumps(self.stats(), indent=2)
+        if filename is not None:
+            with open(filename, 'w') as file:
+                file.write(text)
+        return text
@@ -0,0 +1,106 @@
+import numpy as np
+from .condensed import condensed_index, condensed_pairs, condensed_size, condensed_to_square
+
+
+# Sparse weights keep, per window, only the pairs of vertices with the strongest cross-correlations.
+# All other pairs are treated as uncorrelated, i.e. they get the weight of a correlation of 0.
+# Memory and the weighted part of the forces then scale with the number of kept pairs.
+
+def strongest_pairs(x_corr, num_vert, top_k=None, cutoff=None):
+    """
+    Selects the pairs of vertices with the strongest (absolute) cross-correlations of a window.
+
+    :param x_corr: Numpy 1D array, shape (num_vert*(num_vert+1)/2,)
+        The condensed cross-correlations of the window
+    :param num_vert: int
+        The number of vertices
+    :param top_k: int
+        If given, the pairs of the top_k strongest correlations of every vertex are kept
+    :param cutoff: float
+        If given, only pairs whose absolute correlation is greater than the cutoff are kept
+    :return: tuple of three Numpy 1D arrays
+        Source and target vertices (source < target) and position in the condensed vector of the kept pairs
+
+    """
+
+    sources, targets = condensed_pairs(num_vert)
+    strength = np.abs(x_corr)
+
+    # The diagonal is never kept, a vertex exerts no force on itself
+    keep = sources != targets
+    if cutoff is not None:
+        keep &= strength > cutoff
+    if top_k is not None:
+        top_k = min(top_k, num_vert - 1)
+        # The diagonal is below any correlation, so it is not among the top_k of a row
+        square = condensed_to_square(strength, num_vert, diagonal_value=-1)
+        neighbours = np.argpartition(square, num_vert - top_k, axis=-1)[:, num_vert - top_k:]
+        rows = np.repeat(np.arange(num_vert), top_k)
+        # A pair is kept if it is among the top_k of either of its vertices
+        top = np.zeros(condensed_size(num_vert), dtype=bool)
+        top[condensed_index(num_vert)[rows, neighbours.ravel()]] = True
+        keep &= top
+
+    index = np.flatnonzero(keep)
+    return sources[index], targets[index], index
+
+
+class SparseWeights:
+    """
+    Weights of a window for the kept pairs of vertices only. All other pairs
+    have the same default weight.
+
+    """
+
+    def __init__(self, sources, targets, weights, num_vert, default_weight):
+        """
+        Constructor for the SparseWeights class.
+
+        :param sources: Numpy 1D array
+            The source vertex of every kept pair
+        :param targets: Numpy 1D array
+            The target vertex of every kept pair
+        :param weights: Numpy 1D array
+            The weight of every kept pair
+        :param num_vert: int
+            The number of vertices
+        :param default_weight: float
+            The weight of all other pairs (and of the diagonal)
+
+        """
+
+        self.sources = sources
+        self.targets = targets
+        self.weights = weights
+        self.num_vert = num_vert
+        self.default_weight = default_weight
+
+    def __len__(self):
+        return len(self.weights)
+
+    def to_condensed(self):
+        """
+        Returns the weights as condensed upper triangle.
+
+        :return: Numpy 1D array
+            The condensed weights
+
+        """
+
+        condensed = np.full(condensed_size(self.num_vert), self.default_weight, dtype=self.weights.dtype)
+        condensed[condensed_index(self.num_vert)[self.sources, self.targets]] = self.weights
+        return condensed
+
+    def to_dense(self):
+        """
+        Returns the weights as full matrix.
+
+        :return: Numpy 2D array
+            The symmetric weight matrix
+
+        """
+
+        dense = np.full((self.num_vert, self.num_vert), self.default_weight, dtype=self.weights.dtype)
+        dense[self.sources, self.targets] = self.weights
+        dense[self.targets, self.sources] = self.weights
+        return dense
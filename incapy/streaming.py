@@ -0,0 +1,391 @@
+import socket
+import threading
+import time
+import numpy as np
+import h5py as h5
+from .condensed import condensed_pairs, condensed_size
+from .load_data import DataLoader, LazyWindows
+
+
+class FrameStream:
+    """
+    Source of correlation frames for the StreamingDataLoader. Iterating over the stream yields
+    the condensed cross-correlations of one window after the other, as they become available.
+    The static data (vertices, edges and positions) needs to be known in advance.
+
+    """
+
+    def __init__(self, frames, positions, vertex_ids=None):
+        """
+        Constructor for the FrameStream class.
+
+        :param frames: iterable
+            Yields the condensed cross-correlations of every window (e.g. a generator)
+        :param positions: Numpy 2D array, shape (X, 2)
+            The positions of the vertices
+        :param vertex_ids: Numpy 1D array
+            The vertex IDs, 0 to X-1 by default
+
+        """
+
+        self.frames = frames
+        self.set_vertices(positions, vertex_ids)
+
+    def set_vertices(self, positions, vertex_ids=None):
+        """
+        Sets the static data in the layout of the data files.
+
+        :param positions: Numpy 2D array, shape (X, 2)
+            The positions of the vertices
+        :param vertex_ids: Numpy 1D array
+            The vertex IDs, 0 to X-1 by default
+
+        :return: None
+
+        """
+
+        num_vert = len(positions)
+        self.vertex_ids = np.arange(num_vert) if vertex_ids is None else np.asarray(vertex_ids)
+        # All pairs of the upper triangle, in the order of the condensed cross-correlations
+        self.edge_ids = np.stack(condensed_pairs(num_vert), axis=-1)
+        # Columns: vertex id, x and y position
+        self.positions = np.column_stack((self.vertex_ids, positions)).astype(float)
+        self.frame_durations = np.empty((0, 2))
+
+    def __iter__(self):
+        return iter(self.frames)
+
+    def close(self):
+        """
+        Closes the stream.
+
+        :return: None
+
+        """
+
+        if hasattr(self.frames, 'close'):
+            try:
+                self.frames.close()
+            except ValueError:
+                # The generator is running on the receiving thread, which stops after this frame
+                pass
+
+
+class SocketStream(FrameStream):
+    """
+    Frames received over a TCP connection. The sender first sends the number of vertices
+    (uint32) and their positions (number of vertices x 2 float64), then the condensed
+    cross-correlations of every window (float64). All values are little endian.
+    The stream ends when the sender closes the connection.
+
+    """
+
+    def __init__(self, address, timeout=None):
+        """
+        Constructor for the SocketStream class. Connects and receives the static data.
+
+        :param address: tuple
+            Host and port of the sender
+        :param timeout: float
+            Timeout (in seconds) for connecting
+
+        """
+
+        self.socket = socket.create_connection(address, timeout)
+        self.socket.settimeout(None)
+        self.file = self.socket.makefile('rb')
+
+        num_vert = int(np.frombuffer(self._receive(4), dtype='<u4')[0])
+        positions = np.frombuffer(self._receive(num_vert * 2 * 8), dtype='<f8').reshape(num_vert, 2)
+        self.set_vertices(positions)
+        self.frame_size = condensed_size(num_vert) * 8
+
+    def _receive(self, size):
+        """
+        Receives exactly 'size' bytes.
+
+        :param size: int
+            The number of bytes
+        :return: bytes
+            The data, None if the connection was closed before
+
+        """
+
+        data = self.file.read(size)
+        if len(data) < size:
+            if len(data) == 0:
+                return None
+            raise EOFError("Connection closed within a frame")
+        return data
+
+    def __iter__(self):
+        while True:
+            data = self._receive(self.frame_size)
+            if data is None:
+                return
+            yield np.frombuffer(data, dtype='<f8')
+
+    def close(self):
+        # Shutting down interrupts a thread waiting for data
+        try:
+            self.socket.shutdown(socket.SHUT_RDWR)
+        except OSError:
+            pass
+        self.socket.close()
+
+
+class HDF5Stream(FrameStream):
+    """
+    Frames of an hdf5 file that is still being written (single writer multiple reader, SWMR).
+    The writer appends windows as columns to the resizable cross-correlation dataset, in
+    the same layout as the data files. New windows are polled for until the stream is closed.
+
+    """
+
+    def __init__(self, filename, poll_interval=0.5):
+        """
+        Constructor for the HDF5Stream class. Opens the file and reads the static data.
+
+        :param filename: string
+            The filename of the hdf5 file
+        :param poll_interval: float
+            Time (in seconds) between checks for new windows
+
+        """
+
+        self.file = h5.File(filename, 'r', libver='latest', swmr=True)
+        self.poll_interval = poll_interval
+        self.closed = False
+
+        self.vertex_ids = np.array(self.file['vertexIDs'])
+        self.edge_ids = np.array(self.file['edgeIDs'])
+        self.frame_durations = np.array(self.file['timeVariantData/frameDuration'])
+        self.positions = np.array(self.file['staticData/vertexAttributes/position'])
+        self.dataset = self.file['timeVariantData/edgeAttributes/CrossCorrelations']
+
+    def __iter__(self):
+        window = 0
+        while not self.closed:
+            self.dataset.id.refresh()
+            # First column holds the edge indices
+            while window < self.dataset.shape[1] - 1:
+                yield self.dataset[:, window + 1]
+                window += 1
+            time.sleep(self.poll_interval)
+
+    def close(self):
+        self.closed = True
+
+
+class WindowRingBuffer:
+    """
+    Bounded buffer of the most recent windows of a stream. Windows keep their index in the
+    stream. When the buffer is full, the oldest window is overwritten, but only if the
+    consumer has moved past it; else adding a window blocks until it has (backpressure).
+
+    """
+
+    def __init__(self, capacity):
+        """
+        Constructor for the WindowRingBuffer class.
+
+        :param capacity: int
+            The number of windows kept in memory
+
+        """
+
+        self.capacity = capacity
+        self.windows = {}
+        # Index of the oldest buffered window and the number of windows received
+        self.first = 0
+        self.count = 0
+        # Highest index requested by the consumer
+        self.position = -1
+        self.closed = False
+        self.condition = threading.Condition()
+
+    def __len__(self):
+        return self.count
+
+    def put(self, data):
+        """
+        Appends a window, waits while the buffer is full of windows the consumer has not reached.
+
+        :param data: Numpy array
+            The data of the window
+        :return: bool
+            'False' if the buffer was closed instead
+
+        """
+
+        with self.condition:
+            while self.count - self.first >= self.capacity and self.first >= self.position and not self.closed:
+                self.condition.wait()
+            if self.closed:
+                return False
+
+            if self.count - self.first >= self.capacity:
+                del self.windows[self.first]
+                self.first += 1
+            self.windows[self.count] = data
+            self.count += 1
+            self.condition.notify_all()
+            return True
+
+    def __getitem__(self, index):
+        """
+        Returns a buffered window.
+
+        :param index: int
+            The index of the window in the stream, negative values count from the last received window
+        :return: Numpy array
+            The data of the window
+
+        """
+
+        with self.condition:
+            if index < 0:
+                index += self.count
+            if index >= self.count:
+                raise IndexError("window has not arrived yet")
+            if index < self.first:
+                raise IndexError("window is no longer buffered")
+
+            # Windows before the requested one may be overwritten
+            if index > self.position:
+                self.position = index
+                self.condition.notify_all()
+            return self.windows[index]
+
+    def wait_for(self, count, timeout=None):
+        """
+        Waits until a number of windows has been received.
+
+        :param count: int
+            The number of windows
+        :param timeout: float
+            Maximum time (in seconds) to wait
+        :return: bool
+            'True' if the windows have been received
+
+        """
+
+        with self.condition:
+            return self.condition.wait_for(lambda: self.count >= count or self.closed, timeout) and self.count >= count
+
+    def close(self):
+        """
+        Stops receiving windows and wakes up waiting threads.
+
+        :return: None
+
+        """
+
+        with self.condition:
+            self.closed = True
+            self.condition.notify_all()
+
+
+class StreamingDataLoader(DataLoader):
+    """
+    Class to load windows from a stream while they are recorded. The windows are received on a
+    background thread into a bounded ring buffer, so memory stays bounded for an experiment of any
+    length. If the layout lags behind, receiving blocks until the layout has caught up.
+    Windows can be used as soon as they arrived; weights are built when a window is requested.
+
+    """
+
+    # Every session consumes the stream on its own
+    shareable = False
+
+    def __init__(self, condensed=False, dtype='float64', top_k=None, cutoff=None, capacity=8):
+        """
+        Constructor for class StreamingDataLoader.
+
+        :param condensed: bool
+            If 'True', the weights of each window are kept as condensed upper triangle
+        :param dtype: string or numpy dtype
+            Floating point type of the weights
+        :param top_k: int
+            If given, sparse weights keep the top_k strongest correlations of every vertex
+        :param cutoff: float
+            If given, sparse weights keep the pairs whose absolute correlation is greater than the cutoff
+        :param capacity: int
+            The number of windows kept in memory
+
+        """
+
+        super().__init__(condensed, dtype, top_k, cutoff)
+        self.capacity = capacity
+
+        # The stream and the thread receiving it
+        self.stream = None
+        self.receiver = None
+
+    def load_graph_topology_time_variant(self, source):
+        """
+        Starts receiving the windows of a stream. Returns after the first window has arrived.
+
+        :param source: string or FrameStream
+            A stream (e.g. FrameStream, SocketStream), or the filename of an hdf5 file being written in SWMR mode
+        :return: None
+
+        """
+
+        if isinstance(source, str):
+            source = HDF5Stream(source)
+        self.stream = source
+
+        self.vertex_ids = source.vertex_ids
+        self.edge_ids = source.edge_ids
+        self.frame_durations = source.frame_durations
+        self.positions = source.positions
+        num_vert = len(self.vertex_ids)
+
+        # Indexed like the other loaders, i.e. x_corr[window + 1] are the correlations of a window
+        self.x_corr = WindowRingBuffer(self.capacity + 1)
+        self.x_corr.put(np.arange(len(self.edge_ids)))
+
+        self.weights = LazyWindows(lambda window: self.calculate_weights(self.x_corr[window + 1], num_vert),
+                                   0, 2)
+        self.number_windows = 0
+
+        self.receiver = threading.Thread(target=self._receive, daemon=True)
+        self.receiver.start()
+        # The layout needs a first window
+        self.x_corr.wait_for(2)
+
+    def _receive(self):
+        """
+        Receives the windows of the stream. Runs in the receiving thread.
+
+        :return: None
+
+        """
+
+        try:
+            for x_corr in self.stream:
+                if not self.x_corr.put(np.asarray(x_corr)):
+                    break
+                self.number_windows = len(self.x_corr) - 1
+                self.weights.length = self.number_windows
+        except (OSError, ValueError, EOFError):
+            # Errors of a stream closed while receiving are expected
+            if not self.x_corr.closed:
+                raise
+        finally:
+            # Also wakes up threads waiting for windows that will not arrive anymore
+            self.x_corr.close()
+
+    def close(self):
+        """
+        Stops receiving and closes the stream.
+
+        :return: None
+
+        """
+
+        if self.x_corr is not None:
+            self.x_corr.close()
+        if self.stream is not None:
+            self.stream.close()
@@ -0,0 +1,228 @@
+import os
+import numpy as np
+import h5py as h5
+
+
+# A trajectory holds the vertex positions of precomputed layouts, shape (windows, frames, vertices, 2),
+# together with the parameters they were computed with. It is stored either as hdf5 file
+# ('.h5', '.hdf5') or as numpy archive ('.npz').
+
+def is_hdf5(filename):
+    """
+    Returns whether the trajectory file is an hdf5 file (else a numpy archive).
+
+    :param filename: string
+        The filename of the trajectory
+    :return: bool
+
+    """
+
+    return filename.endswith(('.h5', '.hdf5'))
+
+
+class TrajectoryWriter:
+    """
+    Writes a trajectory window by window. Hdf5 files are written directly to disk, so the
+    whole trajectory never needs to be in memory; numpy archives are written on close.
+    The trajectory is written to a temporary file, renamed to the filename only when closed
+    without error, so an interrupted run never leaves an incomplete trajectory behind.
+
+    """
+
+    def __init__(self, filename, windows, num_frames, vertex_ids, dtype='float64', **metadata):
+        """
+        Constructor for the TrajectoryWriter class.
+
+        :param filename: string
+            The filename of the trajectory, ending with '.h5', '.hdf5' or '.npz'
+        :param windows: list
+            The indices of the windows in the trajectory
+        :param num_frames: int
+            The number of frames per window
+        :param vertex_ids: Numpy 1D array
+            The vertex IDs
+        :param dtype: string or numpy dtype
+            Floating point type of the positions
+        :param metadata:
+            Scalar parameters (e.g. dt) stored along with the positions
+
+        """
+
+        self.filename = filename
+        self.temporary = filename + '.tmp'
+        shape = (len(windows), num_frames, len(vertex_ids), 2)
+
+        if is_hdf5(filename):
+            self.file = h5.File(self.temporary, 'w')
+            # Contiguous layout, so the file can be memory-mapped for playback
+            self.positions = self.file.create_dataset('positions', shape, dtype=dtype)
+            self.file['windows'] = np.asarray(windows)
+            self.file['vertexIDs'] = np.asarray(vertex_ids)
+            for key, value in metadata.items():
+                self.file.attrs[key] = value
+        else:
+            self.file = None
+            self.positions = np.empty(shape, dtype=dtype)
+            self.arrays = dict(metadata, windows=np.asarray(windows), vertexIDs=np.asarray(vertex_ids))
+
+    def write(self, index, frames):
+        """
+        Writes the frames of one window.
+
+        :param index: int
+            The position of the window in the trajectory (not the window index in the data)
+        :param frames: Numpy 3D array, shape (frames, vertices, 2)
+            The vertex positions of all frames of the window
+        :return: None
+
+        """
+
+        self.positions[index] = frames
+
+    def close(self):
+        """
+        Finishes writing the trajectory.
+
+        :return: None
+
+        """
+
+        if self.file is not None:
+            self.file.close()
+            self.file = None
+        elif self.positions is not None:
+            # Written through a file object, np.savez would append '.npz' to the temporary filename
+            with open(self.temporary, 'wb') as file:
+                np.savez(file, positions=self.positions, **self.arrays)
+            self.positions = None
+        else:
+            return
+        os.replace(self.temporary, self.filename)
+
+    def abort(self):
+        """
+        Stops writing the trajectory and removes the incomplete file.
+
+        :return: None
+
+        """
+
+        if self.file is not None:
+            self.file.close()
+            self.file = None
+        self.positions = None
+        if os.path.exists(self.temporary):
+            os.remove(self.temporary)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        if exc_type is None:
+            self.close()
+        else:
+            self.abort()
+
+
+def read_metadata(filename):
+    """
+    Reads the parameters stored along with a trajectory.
+
+    :param filename: string
+        The filename of the trajectory
+    :return: dict
+        The parameters, including 'windows' and 'vertexIDs'
+
+    """
+
+    if is_hdf5(filename):
+        with h5.File(filename, 'r') as file:
+            metadata = {key: value.item() if isinstance(value, np.generic) else value
+                        for key, value in file.attrs.items()}
+            metadata['windows'] = np.array(file['windows'])
+            metadata['vertexIDs'] = np.array(file['vertexIDs'])
+    else:
+        with np.load(filename) as archive:
+            metadata = {key: archive[key] for key in archive.files if key != 'positions'}
+        # Scalars are stored as 0-dimensional arrays
+        metadata = {key: value.item() if value.ndim == 0 else value for key, value in metadata.items()}
+    return metadata
+
+
+class TrajectoryReader:
+    """
+    Reads single frames of a trajectory. Hdf5 trajectories are memory-mapped (or read frame by frame
+    if their layout does not allow it), so seeking to a frame only touches the data of that frame.
+    Numpy archives cannot be memory-mapped and are read completely.
+
+    """
+
+    def __init__(self, filename):
+        """
+        Constructor for the TrajectoryReader class.
+
+        :param filename: string
+            The filename of the trajectory
+
+        """
+
+        self.file = None
+        self.metadata = read_metadata(filename)
+
+        if is_hdf5(filename):
+            self.file = h5.File(filename, 'r')
+            dataset = self.file['positions']
+            offset = dataset.id.get_offset()
+            if offset is not None and dataset.chunks is None:
+                # Contiguous and uncompressed, map the data directly from the file
+                self.positions = np.memmap(filename, dtype=dataset.dtype, mode='r', offset=offset,
+                                           shape=dataset.shape)
+            else:
+                self.positions = dataset
+        else:
+            with np.load(filename) as archive:
+                self.positions = archive['positions']
+
+        # Position of every window of the data in the trajectory
+        self.window_index = {int(window): index for index, window in enumerate(self.metadata['windows'])}
+        self.num_frames = self.positions.shape[1]
+
+    def has_window(self, window):
+        """
+        Returns whether the trajectory contains a window.
+
+        :param window: int
+            The window in the data
+        :return: bool
+
+        """
+
+        return window in self.window_index
+
+    def frame(self, window, frame):
+        """
+        Returns the vertex positions of one frame.
+
+        :param window: int
+            The window in the data
+        :param frame: int
+            The frame within the window
+        :return: Numpy 2D array, shape (X, 2)
+            The vertex positions
+
+        """
+
+        return np.array(self.positions[self.window_index[window], frame])
+
+    def close(self):
+        """
+        Closes the trajectory file.
+
+        :return: None
+
+        """
+
+        self.positions = None
+        if self.file is not None:
+            self.file.close()
+            self.file = None
@@ -0,0 +1,123 @@
+import numpy as np
+from .sparse import SparseWeights
+
+
+# Easing functions, mapping the progress of a transition (0 to 1) to the share of the new weights
+EASINGS = {
+    'linear': lambda t: t,
+    'smoothstep': lambda t: t*t*(3 - 2*t),
+    'cosine': lambda t: (1 - np.cos(np.pi*t)) / 2,
+}
+
+
+class WeightTransition:
+    """
+    Blends the weights of one window into those of the next over a number of steps, instead of
+    switching at once. The blended weights are kept in a buffer owned by the transition and updated
+    in place: every step adds the change of the eased share times the difference of the two windows,
+    so no new weight matrices are built per step. The weights of the loader are never written to.
+
+    """
+
+    def __init__(self, steps=0, easing='linear'):
+        """
+        Constructor for the WeightTransition class.
+
+        :param steps: int
+            The number of steps of a transition, 0 switches at once
+        :param easing: string or function
+            'linear', 'smoothstep', 'cosine', or a function mapping the progress (0 to 1) to the share
+            of the new weights (0 to 1)
+
+        """
+
+        self.steps = steps
+        if not callable(easing):
+            if easing not in EASINGS:
+                raise ValueError("Unknown easing '{}'".format(easing))
+            easing = EASINGS[easing]
+        self.easing = easing
+
+        # The blended weights, the difference of the windows and the change of a step
+        self.weights = None
+        self.delta = None
+        self.scratch = None
+        # The weights blended into, the current step and share of the new weights
+        self.target = None
+        self.step = 0
+        self.share = 0
+
+    def is_active(self):
+        """
+        Returns whether a transition is in progress.
+
+        :return: bool
+
+        """
+
+        return self.target is not None
+
+    def start(self, current, target):
+        """
+        Starts a transition from the current weights to those of a new window.
+
+        :param current: Numpy 2D or 1D array, or SparseWeights
+            The weights used so far (may be the blended weights of an unfinished transition)
+        :param target: Numpy 2D or 1D array, or SparseWeights
+            The weights of the new window
+        :return: Numpy array or SparseWeights
+            The weights to be used now: the blend buffer, or the target if there is nothing to blend
+
+        """
+
+        # Sparse weights keep different pairs in every window, they are switched at once
+        if self.steps <= 0 or isinstance(current, SparseWeights) or isinstance(target, SparseWeights) \
+                or np.shape(current) != np.shape(target):
+            self.target = None
+            return target
+
+        # (Re)allocate only if the form of the weights changed
+        if self.weights is None or self.weights.shape != target.shape or self.weights.dtype != target.dtype:
+            self.weights = np.empty_like(target)
+            self.delta = np.empty_like(target)
+            self.scratch = np.empty_like(target)
+        if current is not self.weights:
+            np.copyto(self.weights, current)
+        np.subtract(target, self.weights, out=self.delta)
+
+        self.target = target
+        self.step = 0
+        self.share = 0
+        return self.weights
+
+    def advance(self):
+        """
+        Moves the blended weights one step towards the target.
+
+        :return: Numpy array or None
+            The weights to be used from now on if the transition is finished (the target), else None
+
+        """
+
+        self.step += 1
+        if self.step >= self.steps:
+            # The target itself is used from now on, free of rounding errors of the blending
+            target = self.target
+            self.target = None
+            return target
+
+        share = self.easing(self.step / self.steps)
+        np.multiply(self.delta, share - self.share, out=self.scratch)
+        self.weights += self.scratch
+        self.share = share
+        return None
+
+    def cancel(self):
+        """
+        Stops the current transition, the blended weights are not changed anymore.
+
+        :return: None
+
+        """
+
+        self.target = None